@@ -1,17 +1,121 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
-from orchestrator.task_manager import TaskManager
-from llm.llm_service import LLMService
+import atexit
+import concurrent.futures
+import json
+import math
+import os
+import time
+import zlib
+from datetime import datetime
+from orchestrator.task_manager import TaskManager, TERMINAL_STATUSES
+from orchestrator.task_executor import TaskExecutor
+from orchestrator.task_store import SQLiteTaskStore
+from orchestrator.event_bus import EventBus
+from llm.service_registry import ServiceRegistry
+from llm.async_runner import AsyncRunner
 from llm.task_handler import TaskHandler
 from llm.config import LLMConfig
+from llm.metrics import REGISTRY
 
 app = Flask(__name__)
 CORS(app)
 
-task_manager = TaskManager()
-llm_service = LLMService()
-task_handler = TaskHandler()
+task_events = EventBus()
+task_store_path = LLMConfig.TASK_STORE_CONFIG["path"]
+task_manager = TaskManager(
+    SQLiteTaskStore(task_store_path) if task_store_path else None,
+    max_finished=LLMConfig.TASK_STORE_CONFIG["max_finished"],
+    events=task_events
+)
+# One ModelManager and AdaptiveConfig per process, shared by every service object
+ServiceRegistry.startup()
+atexit.register(ServiceRegistry.shutdown)
+# Hooks run in reverse order: the store closes after the executor has stopped
+ServiceRegistry.on_shutdown(task_manager.close)
+ServiceRegistry.on_shutdown(task_events.close)
+llm_service = ServiceRegistry.llm_service()
+task_handler = TaskHandler(llm_service)
 LLMConfig.initialize()
+# Every request's LLM coroutines run on one shared event loop per process
+async_runner = AsyncRunner(LLMConfig.SERVING_CONFIG["max_concurrency"])
+ServiceRegistry.on_shutdown(async_runner.shutdown)
+# Queued tasks run through the LLM pipeline on the same loop; stopped before it
+task_executor = TaskExecutor(
+    task_manager,
+    task_handler.run_task,
+    async_runner,
+    workers=LLMConfig.TASK_EXECUTOR_CONFIG["workers"],
+    type_limits=LLMConfig.TASK_EXECUTOR_CONFIG["type_limits"]
+)
+ServiceRegistry.on_shutdown(task_executor.shutdown)
+# Queue and concurrency stats are exported as gauges next to the stage histograms
+REGISTRY.register_gauges("llm_serving", async_runner.stats)
+REGISTRY.register_gauges("task_executor", task_executor.stats)
+REGISTRY.register_gauges("task_events", task_events.stats)
+REGISTRY.register_gauges("llm_response_cache", llm_service.model_manager.get_cache_stats)
+
+def _chat_payload(llm_response):
+    """Build the chat reply, creating a task when the LLM asks for one"""
+    # Failed pipelines return {"success": False, "error": ...} without a response
+    message = llm_response.get('response', llm_response.get('error'))
+    if llm_response.get('create_task'):
+        task = task_executor.submit(task_manager.create_task(llm_response['task_details']))
+        return {
+            'message': message,
+            'task': task.to_dict()
+        }
+    
+    return {'message': message}
+
+def _run_async(coro):
+    """Await an LLM coroutine on the shared loop from a request thread"""
+    return async_runner.run(coro, timeout=LLMConfig.SERVING_CONFIG["request_timeout"])
+
+def _batch_response(items, run_batch):
+    """Run a batch endpoint's items, reporting per-item results and the failure count"""
+    if not isinstance(items, list) or not items:
+        return jsonify({'success': False, 'error': 'Expected a non-empty list'}), 400
+    max_items = LLMConfig.SERVING_CONFIG["batch_max_items"]
+    if len(items) > max_items:
+        return jsonify({'success': False, 'error': f"At most {max_items} items per batch"}), 400
+
+    # Each item gets the single-request deadline and holds its own runner
+    # slot; the batch waits for as many waves of items as it has
+    item_timeout = LLMConfig.SERVING_CONFIG["request_timeout"]
+    concurrency = LLMConfig.SERVING_CONFIG["batch_concurrency"]
+    waves = math.ceil(len(items) / max(1, concurrency))
+    results = async_runner.run(
+        run_batch(items, concurrency, item_timeout, async_runner.slot),
+        timeout=item_timeout * waves,
+        limited=False
+    )
+    failed = sum(1 for result in results if not result.get('success'))
+    return jsonify({
+        'success': failed == 0,
+        'results': results,
+        'succeeded': len(results) - failed,
+        'failed': failed
+    })
+
+def _parse_since(value):
+    """Accept an ISO timestamp, as in a task's updatedAt, or epoch seconds"""
+    try:
+        return datetime.fromtimestamp(float(value))
+    except ValueError:
+        return datetime.fromisoformat(value)
+
+def _sse(event, data, event_id=None):
+    prefix = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{prefix}event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _list_arg(name):
+    """Values of a query parameter given repeatedly or comma-separated"""
+    return {value for values in request.args.getlist(name) for value in values.split(',') if value}
+
+@app.errorhandler(concurrent.futures.TimeoutError)
+def request_timeout(error):
+    return jsonify({'success': False, 'error': 'Request timed out'}), 504
 
 @app.route('/api/chat', methods=['POST'])
 def chat():
@@ -19,45 +123,234 @@ def chat():
     user_input = data.get('message')
     
     # Process the message through LLM
-    llm_response = llm_service.process_input(user_input)
+    llm_response = _run_async(llm_service.process_input(user_input))
     
-    # Create task if needed
-    if llm_response.get('create_task'):
-        task = task_manager.create_task(llm_response['task_details'])
-        return jsonify({
-            'message': llm_response['response'],
-            'task': task.to_dict()
-        })
+    return jsonify(_chat_payload(llm_response))
+
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    data = request.json
+    user_input = data.get('message')
     
-    return jsonify({'message': llm_response['response']})
+    def events():
+        # Tokens are pushed as they are decoded; the last event carries the usual chat payload
+        for event in async_runner.iterate(llm_service.process_input_stream(user_input)):
+            if event['event'] == 'token':
+                yield _sse('token', {'token': event['token']})
+            else:
+                yield _sse('done', _chat_payload(event['result']))
+    
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/system/memory', methods=['GET'])
+def memory_stats():
+    return jsonify(llm_service.model_manager.get_memory_stats())
+
+@app.route('/api/system/serving', methods=['GET'])
+def serving_stats():
+    return jsonify(async_runner.stats())
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/api/tasks', methods=['GET'])
 def get_tasks():
-    tasks = task_manager.get_all_tasks()
-    return jsonify({'tasks': [task.to_dict() for task in tasks]})
+    # Unchanged since the client's last poll of this exact query: nothing to send. The revision
+    # comes from the shared task store, so a poll answered by another worker validates too;
+    # without a store every worker has its own tasks, so its ETags only match its own.
+    revision = task_manager.latest_revision()
+    scope = "" if task_manager.store is not None else f"{os.getpid()}-"
+    etag = f"{scope}{revision}-{zlib.crc32(request.query_string):08x}"
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+
+    args = request.args
+    try:
+        since = _parse_since(args['since']) if args.get('since') else None
+        cursor = int(args.get('cursor', 0))
+        limit = int(args['limit']) if args.get('limit') else None
+        if limit is not None and not 1 <= limit <= 1000:
+            raise ValueError("limit must be between 1 and 1000")
+    except ValueError as e:
+        return jsonify({'success': False, 'error': f"Invalid query: {str(e)}"}), 400
+
+    tasks, next_cursor = task_manager.list_tasks(
+        status=args.get('status'),
+        task_type=args.get('type'),
+        since=since,
+        cursor=cursor,
+        limit=limit
+    )
+    response = jsonify({
+        'tasks': [task.to_dict() for task in tasks],
+        'revision': revision,
+        'nextCursor': next_cursor
+    })
+    response.set_etag(etag)
+    return response
+
+@app.route('/api/tasks/events', methods=['GET'])
+def task_events_stream():
+    task_ids = _list_arg('task_id')
+    task_types = _list_arg('type')
+    # A reconnecting EventSource sends the last revision it saw
+    cursor = request.headers.get('Last-Event-ID') or request.args.get('cursor')
+    try:
+        cursor = int(cursor) if cursor else None
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Invalid cursor'}), 400
+
+    def matches(task):
+        return (not task_ids or task['id'] in task_ids) and (not task_types or task['type'] in task_types)
+
+    # Subscribe before replaying so no change falls between the two
+    subscription = task_events.subscribe(lambda event: matches(event['task']))
+    heartbeat = LLMConfig.SERVING_CONFIG["event_heartbeat"]
+
+    def events():
+        try:
+            last = cursor or 0
+            if cursor is not None:
+                replay, _ = task_manager.list_tasks(
+                    task_type=next(iter(task_types)) if len(task_types) == 1 else None,
+                    cursor=cursor
+                )
+                for task in replay:
+                    if matches(task.to_dict()):
+                        yield _sse('task.updated', task.to_dict(), task.revision)
+                    last = max(last, task.revision)
+            while True:
+                event = subscription.get(timeout=heartbeat)
+                if event is None:
+                    if subscription.closed:
+                        # Fell behind or shutting down: the client re-syncs from this revision
+                        yield _sse('reset', {'reason': subscription.reason, 'revision': last})
+                        break
+                    yield ": heartbeat\n\n"
+                    continue
+                if event['revision'] <= last:
+                    continue
+                last = event['revision']
+                yield _sse(event['type'], event['task'], event['revision'])
+        finally:
+            subscription.close()
+
+    def store_events():
+        # Every worker commits to the shared store in revision order, so
+        # tailing it sees all of them; this worker's own events only wake
+        # the tail early and name the event type
+        types = {}
+        poll = LLMConfig.SERVING_CONFIG["event_poll"]
+        task_type = next(iter(task_types)) if len(task_types) == 1 else None
+        try:
+            last = cursor if cursor is not None else task_manager.latest_revision()
+            idle = 0.0
+            while True:
+                sent = False
+                for task in task_manager.committed_changes(last, task_type):
+                    last = task.revision
+                    if matches(task.to_dict()):
+                        yield _sse(types.pop(task.revision, 'task.updated'), task.to_dict(), task.revision)
+                        sent = True
+                types = {revision: event for revision, event in types.items() if revision > last}
+                idle = 0.0 if sent else idle
+                if idle >= heartbeat:
+                    yield ": heartbeat\n\n"
+                    idle = 0.0
+
+                started = time.monotonic()
+                event = subscription.get(timeout=poll)
+                idle += time.monotonic() - started
+                if event is None and subscription.closed:
+                    # Fell behind or shutting down: the client re-syncs from this revision
+                    yield _sse('reset', {'reason': subscription.reason, 'revision': last})
+                    break
+                if event is not None:
+                    types[event['revision']] = event['type']
+        finally:
+            subscription.close()
+
+    return Response(
+        stream_with_context(store_events() if task_manager.store is not None else events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/tasks', methods=['POST'])
+def create_task():
+    data = request.json
+    try:
+        task = task_executor.submit(task_manager.create_task(data))
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'success': False, 'error': f"Invalid task: {str(e)}"}), 400
+    return jsonify({'task': task.to_dict()}), 201
+
+@app.route('/api/tasks/<task_id>', methods=['GET'])
+def get_task(task_id):
+    task = task_manager.get_task(task_id)
+    if task is None:
+        return jsonify({'success': False, 'error': 'Task not found'}), 404
+    return jsonify({'task': task.to_dict()})
+
+@app.route('/api/tasks/<task_id>/cancel', methods=['POST'])
+def cancel_task(task_id):
+    task = task_manager.get_task(task_id)
+    if task is None:
+        return jsonify({'success': False, 'error': 'Task not found'}), 404
+    if task.status not in TERMINAL_STATUSES and not task_manager.owns(task_id):
+        # Queued or running in another worker process sharing the store
+        return jsonify({'success': False, 'error': 'Task is owned by another worker', 'task': task.to_dict()}), 409
+    cancelled = task_executor.cancel(task_id)
+    return jsonify({'success': cancelled, 'task': task_manager.get_task(task_id).to_dict()})
+
+@app.route('/api/system/tasks', methods=['GET'])
+def task_stats():
+    return jsonify(dict(task_executor.stats(), events=task_events.stats()))
 
 @app.route('/api/llm/analyze', methods=['POST'])
 def analyze_task():
     data = request.json
-    result = task_handler.analyze_task(data.get('task'))
+    result = _run_async(task_handler.analyze_task(data.get('task')))
     return jsonify(result)
 
+@app.route('/api/llm/analyze/batch', methods=['POST'])
+def analyze_tasks():
+    data = request.json
+    return _batch_response(data.get('tasks'), task_handler.analyze_tasks)
+
 @app.route('/api/llm/generate', methods=['POST'])
 def generate_code():
     data = request.json
-    result = task_handler.generate_java_code(
+    result = _run_async(task_handler.generate_java_code(
         data.get('task'),
         data.get('context')
-    )
+    ))
     return jsonify(result)
 
+@app.route('/api/llm/generate/batch', methods=['POST'])
+def generate_code_batch():
+    data = request.json
+    # Items are {"task": ..., "context": ...}; a top-level context applies to items without one
+    items = data.get('items')
+    if isinstance(items, list) and data.get('context') is not None:
+        items = [dict(item, context=item.get('context', data['context'])) if isinstance(item, dict) else item
+                 for item in items]
+    return _batch_response(items, task_handler.generate_java_code_many)
+
 @app.route('/api/llm/execute', methods=['POST'])
 def execute_code():
     data = request.json
-    result = task_handler.execute_dynamic_code(
+    result = _run_async(task_handler.execute_dynamic_code(
         data.get('task'),
         data.get('code')
-    )
+    ))
     return jsonify(result)
 
 if __name__ == '__main__':
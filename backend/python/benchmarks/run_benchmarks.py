@@ -0,0 +1,375 @@
+"""Offline benchmarks for the LLM pipeline
+
+Runs ModelManager, LLMService and AdaptiveConfig against tiny in-process
+models so no weights are downloaded. Run from backend/python:
+
+    python -m benchmarks.run_benchmarks
+    python -m benchmarks.run_benchmarks --output before.json
+    python -m benchmarks.run_benchmarks --compare before.json
+"""
+from typing import Dict, Any, List
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from benchmarks.stub_backend import StubModelManager, ByteTokenizer
+from llm.llm_service import LLMService, CONTEXT_PROMPT, SOLUTION_PROMPT, VALIDATION_PROMPT
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+def benchmark_models_config(max_length: int, cache: bool) -> Dict[str, Any]:
+    return {
+        "local_models": {
+            "tiny": {
+                "path": "stub://tiny",
+                "type": "causal",
+                "max_length": max_length,
+                "device": "cpu",
+                "layers": 2,
+                "hidden": 64,
+                "heads": 4
+            }
+        },
+        "api_models": {},
+        "fallback_strategy": {
+            "order": ["local"],
+            "timeout": 300
+        },
+        "response_cache": {
+            "enabled": cache
+        }
+    }
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """Summarise latencies given in seconds as milliseconds"""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def at(fraction: float) -> float:
+        index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+        return round(ordered[index] * 1000, 3)
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3),
+        "min_ms": round(ordered[0] * 1000, 3),
+        "p50_ms": at(0.50),
+        "p90_ms": at(0.90),
+        "p99_ms": at(0.99),
+        "max_ms": round(ordered[-1] * 1000, 3)
+    }
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(peak / divisor, 1)
+
+def new_tokens(prompt: str, response: str) -> int:
+    tokenizer = ByteTokenizer()
+    return max(0, len(tokenizer.encode(response)) - len(tokenizer.encode(prompt)))
+
+def instrument(obj: Any, method_name: str, timings: Dict[str, List[float]]):
+    """Wrap an instance method so every call records its wall time"""
+    method = getattr(obj, method_name)
+    samples = timings.setdefault(method_name, [])
+
+    if asyncio.iscoroutinefunction(method):
+        async def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await method(*args, **kwargs)
+            finally:
+                samples.append(time.perf_counter() - start)
+    else:
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                samples.append(time.perf_counter() - start)
+
+    setattr(obj, method_name, timed)
+
+async def bench_generate(manager: StubModelManager, requests: int, concurrency: int) -> Dict[str, Any]:
+    """Latency and throughput of ModelManager.generate at a given concurrency"""
+    prompts = [f"Benchmark request {i}: report the deployment status of service {i % 7}" for i in range(requests)]
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+
+    async def one(prompt: str) -> int:
+        async with semaphore:
+            start = time.perf_counter()
+            result = await manager.generate(prompt)
+            latencies.append(time.perf_counter() - start)
+            return new_tokens(prompt, result["response"])
+
+    start = time.perf_counter()
+    tokens = await asyncio.gather(*[one(prompt) for prompt in prompts])
+    wall = time.perf_counter() - start
+
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "latency": percentiles(latencies),
+        "requests_per_second": round(requests / wall, 3),
+        "tokens_per_second": round(sum(tokens) / wall, 3)
+    }
+
+async def bench_stream(manager: StubModelManager, requests: int) -> Dict[str, Any]:
+    """Time to first token and total time of ModelManager.generate_stream"""
+    timings: Dict[str, List[float]] = {}
+    instrument(manager, "_generate_local_stream", timings)
+    first_token: List[float] = []
+    total: List[float] = []
+    for i in range(requests):
+        start = time.perf_counter()
+        first = None
+        # The preference LLMService.process_input_stream sends, which names no stub model
+        async for event in manager.generate_stream(
+            f"Streaming benchmark {i}: list the open incidents",
+            model_preference="local/codellama"
+        ):
+            if first is None and not event.get("done"):
+                first = time.perf_counter() - start
+        first_token.append(first)
+        total.append(time.perf_counter() - start)
+
+    if len(timings["_generate_local_stream"]) != requests:
+        raise RuntimeError("generate_stream fell back to generate() instead of decoding incrementally")
+
+    return {
+        "requests": requests,
+        "time_to_first_token": percentiles(first_token),
+        "total": percentiles(total)
+    }
+
+def pipeline_input(i: int) -> str:
+    return f"Deploy build {i} of the billing service to staging"
+
+async def bench_process_input(service: Any, requests: int) -> Dict[str, Any]:
+    """End-to-end LLMService.process_input latency with per-stage timings"""
+    timings: Dict[str, List[float]] = {}
+    for method_name in ("_extract_context", "_execute_pattern", "_generate_new_solution", "_validate_solution"):
+        instrument(service, method_name, timings)
+    for method_name in ("get_best_pattern", "adapt_to_feedback"):
+        instrument(service.adaptive_config, method_name, timings)
+    instrument(service.model_manager, "generate", timings)
+
+    latencies: List[float] = []
+    for i in range(requests):
+        start = time.perf_counter()
+        await service.process_input(pipeline_input(i))
+        latencies.append(time.perf_counter() - start)
+
+    # Every request extracts, looks up and adapts, and either executes a learned pattern or
+    # generates and validates a new solution; each generated solution costs two model calls
+    calls = {name: len(timings.get(name, [])) for name in (
+        "_extract_context", "get_best_pattern", "adapt_to_feedback",
+        "_execute_pattern", "_generate_new_solution", "_validate_solution", "generate"
+    )}
+    generated = calls["_generate_new_solution"]
+    if (calls["_extract_context"] != requests or calls["get_best_pattern"] != requests
+            or calls["adapt_to_feedback"] != requests or calls["_execute_pattern"] + generated != requests
+            or calls["_validate_solution"] != generated or calls["generate"] != requests + 2 * generated):
+        raise RuntimeError(f"process_input skipped stages for {requests} requests: {calls}")
+
+    return {
+        "requests": requests,
+        "latency": percentiles(latencies),
+        "stages": {name: percentiles(samples) for name, samples in timings.items() if samples}
+    }
+
+def batching_totals(manager: StubModelManager) -> Dict[str, int]:
+    stats = manager.get_batching_stats().values()
+    return {key: sum(model_stats[key] for model_stats in stats) for key in ("batches", "requests")}
+
+async def bench_process_many(service: Any, requests: int, concurrency: int) -> Dict[str, Any]:
+    """LLMService.process_many throughput and how its model calls were grouped into batches"""
+    # Inputs the process_input benchmark did not send, so no stage is answered from the cache
+    inputs = [f"{pipeline_input(i)} and notify team {i}" for i in range(requests)]
+    before = batching_totals(service.model_manager)
+    start = time.perf_counter()
+    results = await service.process_many(inputs, concurrency)
+    wall = time.perf_counter() - start
+    after = batching_totals(service.model_manager)
+
+    batches = after["batches"] - before["batches"]
+    batched = after["requests"] - before["requests"]
+    # Items run together, so their context extraction calls at least must share batches
+    if requests > 1 and concurrency > 1 and not batches < batched:
+        raise RuntimeError(f"process_many did not group model calls: {batched} calls in {batches} batches")
+
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "items_per_second": round(requests / wall, 3),
+        "failed": sum(1 for result in results if not result.get("success")),
+        "batches": batches,
+        "avg_batch_size": round(batched / batches, 2) if batches else 0.0
+    }
+
+def synthetic_context(i: int) -> Dict[str, Any]:
+    return {
+        "service": f"service-{i % 50}",
+        "environment": ("dev", "staging", "prod")[i % 3],
+        "action": f"action-{i % 20}",
+        "region": ("eu-west-1", "us-east-1", "ap-south-1", "us-west-2")[i % 4],
+        "request_id": i
+    }
+
+def bench_adaptive_config(adaptive_config: Any, patterns: int, queries: int) -> Dict[str, Any]:
+    """Cost of learning patterns and of AdaptiveConfig.get_best_pattern lookups"""
+    learn: List[float] = []
+    for i in range(patterns):
+        start = time.perf_counter()
+        adaptive_config.learn_pattern("execution", synthetic_context(i))
+        learn.append(time.perf_counter() - start)
+
+    lookup: List[float] = []
+    for i in range(queries):
+        context = synthetic_context(i * 7919)
+        start = time.perf_counter()
+        adaptive_config.get_best_pattern("execution", context)
+        lookup.append(time.perf_counter() - start)
+
+    return {
+        "patterns": patterns,
+        "queries": queries,
+        "learn_pattern": percentiles(learn),
+        "get_best_pattern": percentiles(lookup)
+    }
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).resolve().parent,
+            stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    config_dir = Path("config/models")
+    config_dir.mkdir(parents=True, exist_ok=True)
+    with open(config_dir / "models_config.json", 'w') as f:
+        json.dump(benchmark_models_config(args.max_length, args.cache), f, indent=2)
+
+    manager = StubModelManager()
+    results: Dict[str, Any] = {}
+    try:
+        # Load the model once so the first measurement is not a cold start
+        await manager.generate("warm up")
+        results["model_load"] = manager.get_registry_stats()["models"]
+
+        results["generate"] = [
+            await bench_generate(manager, args.requests, concurrency)
+            for concurrency in args.concurrency
+        ]
+        results["generate_stream"] = await bench_stream(manager, args.stream_requests)
+
+        service = LLMService(model_manager=manager)
+        results["process_input"] = await bench_process_input(service, args.pipeline_requests)
+        results["process_many"] = await bench_process_many(service, args.pipeline_requests, max(args.concurrency))
+
+        results["adaptive_config"] = bench_adaptive_config(service.adaptive_config, args.patterns, args.queries)
+    finally:
+        manager.shutdown()
+
+    results["peak_rss_mb"] = peak_rss_mb()
+    return results
+
+def flatten(data: Any, prefix: str = "") -> Dict[str, float]:
+    """Flatten nested results into dotted metric names with numeric values"""
+    flat: Dict[str, float] = {}
+    if isinstance(data, dict):
+        for key, value in data.items():
+            flat.update(flatten(value, f"{prefix}.{key}" if prefix else str(key)))
+    elif isinstance(data, list):
+        for index, value in enumerate(data):
+            label = f"c{value['concurrency']}" if isinstance(value, dict) and "concurrency" in value else str(index)
+            flat.update(flatten(value, f"{prefix}[{label}]"))
+    elif isinstance(data, (int, float)) and not isinstance(data, bool):
+        flat[prefix] = data
+    return flat
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any]) -> List[str]:
+    before = flatten(baseline["results"])
+    after = flatten(current["results"])
+    lines = [f"{'metric':<70} {'baseline':>12} {'current':>12} {'change':>9}"]
+    for name in sorted(set(before) & set(after)):
+        old, new = before[name], after[name]
+        change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+        lines.append(f"{name:<70} {old:>12} {new:>12} {change:>9}")
+    return lines
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the LLM pipeline")
+    parser.add_argument("--requests", type=int, default=32, help="generate() calls per concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--stream-requests", type=int, default=8)
+    parser.add_argument("--pipeline-requests", type=int, default=8)
+    parser.add_argument("--patterns", type=int, default=1000, help="patterns learned before lookups")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--max-length", type=int, default=512, help="stub max_length in tokens (bytes)")
+    parser.add_argument("--cache", action="store_true", help="leave the response cache enabled")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", help="baseline results file to diff against")
+    args = parser.parse_args(argv)
+
+    # A prompt at or over max_length leaves no room to generate, so stages would only time that failure
+    longest = max(
+        len(prompt.encode("utf-8"))
+        for prompt in (CONTEXT_PROMPT + pipeline_input(args.pipeline_requests), SOLUTION_PROMPT, VALIDATION_PROMPT)
+    )
+    if args.max_length <= longest:
+        parser.error(f"--max-length must be above the longest pipeline prompt ({longest} bytes)")
+
+    output = Path(args.output).resolve() if args.output else RESULTS_DIR / f"{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    baseline_path = Path(args.compare).resolve() if args.compare else None
+
+    original_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="llm-bench-") as workdir:
+        os.chdir(workdir)
+        try:
+            started = time.time()
+            results = asyncio.run(run(args))
+        finally:
+            os.chdir(original_cwd)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(),
+            "duration_seconds": round(time.time() - started, 2),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "parameters": vars(args)
+        },
+        "results": results
+    }
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+    if baseline_path:
+        with open(baseline_path, 'r') as f:
+            baseline = json.load(f)
+        print("\n".join(compare(baseline, report)))
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
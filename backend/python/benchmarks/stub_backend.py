@@ -0,0 +1,94 @@
+from typing import Dict, Any, List, Tuple, Union
+import torch
+from transformers import BatchEncoding, GPT2Config, GPT2LMHeadModel
+from llm.model_manager import ModelManager
+
+class ByteTokenizer:
+    """Deterministic byte-level tokenizer; ids 0-255 are bytes, 256 is EOS
+
+    Implements the subset of the Hugging Face tokenizer interface that
+    ModelManager and TextStreamer use, so benchmarks never need to download
+    a vocabulary.
+    """
+
+    eos_token = "<eos>"
+    eos_token_id = 256
+    vocab_size = 257
+
+    def __init__(self):
+        self.pad_token = None
+        self.padding_side = "right"
+
+    @property
+    def pad_token_id(self):
+        return self.eos_token_id if self.pad_token is not None else None
+
+    def encode(self, text: str) -> List[int]:
+        return list(text.encode("utf-8")) or [self.eos_token_id]
+
+    def __call__(self, text: Union[str, List[str]], return_tensors: str = "pt", padding: bool = False,
+                 truncation: bool = False, max_length: int = None) -> BatchEncoding:
+        texts = [text] if isinstance(text, str) else list(text)
+        encoded = [self.encode(t) for t in texts]
+        if truncation and max_length:
+            encoded = [ids[:max_length] for ids in encoded]
+
+        width = max(len(ids) for ids in encoded)
+        input_ids, attention_mask = [], []
+        for ids in encoded:
+            padding_ids = [self.eos_token_id] * (width - len(ids))
+            padding_mask = [0] * len(padding_ids)
+            mask = [1] * len(ids)
+            if self.padding_side == "left":
+                input_ids.append(padding_ids + ids)
+                attention_mask.append(padding_mask + mask)
+            else:
+                input_ids.append(ids + padding_ids)
+                attention_mask.append(mask + padding_mask)
+
+        return BatchEncoding({
+            "input_ids": torch.tensor(input_ids, dtype=torch.long),
+            "attention_mask": torch.tensor(attention_mask, dtype=torch.long)
+        })
+
+    def decode(self, ids: Any, skip_special_tokens: bool = True, **kwargs) -> str:
+        if hasattr(ids, "tolist"):
+            ids = ids.tolist()
+        data = bytes(i for i in ids if i < 256)
+        return data.decode("utf-8", errors="replace")
+
+    def batch_decode(self, sequences: Any, skip_special_tokens: bool = True, **kwargs) -> List[str]:
+        return [self.decode(ids, skip_special_tokens=skip_special_tokens) for ids in sequences]
+
+def build_tiny_model(layers: int = 2, hidden: int = 64, heads: int = 4, positions: int = 512, seed: int = 0):
+    """Randomly initialised GPT-2 with a fixed seed, small enough to run anywhere"""
+    torch.manual_seed(seed)
+    config = GPT2Config(
+        vocab_size=ByteTokenizer.vocab_size,
+        n_positions=positions,
+        n_embd=hidden,
+        n_layer=layers,
+        n_head=heads,
+        bos_token_id=ByteTokenizer.eos_token_id,
+        eos_token_id=ByteTokenizer.eos_token_id
+    )
+    model = GPT2LMHeadModel(config)
+    model.eval()
+    return model
+
+class StubModelManager(ModelManager):
+    """ModelManager whose local models are tiny in-process GPT-2s
+
+    A local model config may set "layers", "hidden" and "heads" to size the
+    stub; everything else (registry, batching, caches, fallback) is the
+    production code path.
+    """
+
+    def _load_weights(self, config: Dict[str, Any]) -> Tuple[Any, Any]:
+        model = build_tiny_model(
+            layers=config.get("layers", 2),
+            hidden=config.get("hidden", 64),
+            heads=config.get("heads", 4),
+            positions=max(512, config["max_length"])
+        )
+        return model, ByteTokenizer()
\ No newline at end of file
@@ -0,0 +1,23 @@
+"""Gunicorn settings for serving app.py with several worker processes
+
+    gunicorn -c gunicorn.conf.py app:app
+
+preload_app imports app.py once in the master. With "preload" enabled in
+config/models/models_config.json the local models are loaded there before
+the workers fork, and every worker shares their weights copy-on-write.
+GET /api/system/memory reports shared and private memory per worker.
+
+Request threads only wait on the worker's shared event loop (see
+llm/async_runner.py), but each waiting request still holds its thread.
+threads therefore defaults to LLM_MAX_CONCURRENCY, so a worker can keep
+that many pipelines in flight; set GUNICORN_THREADS higher to leave room
+for long-lived event streams.
+"""
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:5000")
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+preload_app = True
+worker_class = "gthread"
+# Same default as LLMConfig.SERVING_CONFIG["max_concurrency"]
+threads = int(os.getenv("GUNICORN_THREADS", os.getenv("LLM_MAX_CONCURRENCY", "32")))
\ No newline at end of file
@@ -1,31 +1,150 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
+from collections import deque
+import heapq
 import json
+import math
+import statistics
 from pathlib import Path
 import os
+import threading
+import time
 from datetime import datetime
+from .pattern_store import PatternStore
+from .write_behind import WriteBehind
+from .pattern_index import PatternIndex, pattern_hash
+from .pattern_metrics import PatternMetrics
+from .pattern_similarity import PatternSimilarityIndex, similarity_available
+
+PATTERN_TYPES = ("code", "integration", "execution")
 
 class AdaptiveConfig:
     def __init__(self):
+        # Shared by request threads and the write-behind flushers
+        self._lock = threading.RLock()
         self.config_path = Path("config/adaptive")
         self.config_path.mkdir(parents=True, exist_ok=True)
         self.learning_path = self.config_path / "learned_patterns.json"
+        self.store_path = self.config_path / "learned_patterns.db"
         self.integration_path = self.config_path / "integrations.json"
+        self.settings_path = self.config_path / "settings.json"
         self._load_configs()
 
     def _load_configs(self):
         """Load or initialize configuration files"""
-        self.learned_patterns = self._load_json(self.learning_path, {
-            "code_patterns": {},
-            "integration_patterns": {},
-            "execution_patterns": {},
-            "success_metrics": {}
+        self.settings = self._load_json(self.settings_path, {
+            "similarity": {
+                "enabled": False,
+                "dim": 128
+            },
+            "retention": {
+                "max_patterns": {pattern_type: 5000 for pattern_type in PATTERN_TYPES},
+                "half_life_hours": 168,
+                "evict_fraction": 0.1
+            },
+            "persistence": {
+                "flush_interval": 1.0,
+                "max_pending": 500
+            },
+            "ranking": {
+                "candidates": 20,
+                "latency_window": 32,
+                "ewma_alpha": 0.2,
+                "latency_reference_ms": 1000
+            }
         })
+        similarity = self.settings.get("similarity", {})
+        self.similarity_enabled = similarity.get("enabled", False) and similarity_available()
+        self.similarity_dim = similarity.get("dim", 128)
+        retention = self.settings.get("retention", {})
+        self.pattern_limits = retention.get("max_patterns", {pattern_type: 5000 for pattern_type in PATTERN_TYPES})
+        self.half_life = retention.get("half_life_hours", 168) * 3600
+        self.evict_fraction = retention.get("evict_fraction", 0.1)
+        self._evicted = {pattern_type: 0 for pattern_type in PATTERN_TYPES}
+        self._recent_evictions = deque(maxlen=20)
+        ranking = self.settings.get("ranking", {})
+        self.ranking_candidates = ranking.get("candidates", 20)
+        self.latency_window = ranking.get("latency_window", 32)
+        self.ewma_alpha = ranking.get("ewma_alpha", 0.2)
+        self.latency_reference = ranking.get("latency_reference_ms", 1000) / 1000
+        persistence = self.settings.get("persistence", {})
+        flush_interval = persistence.get("flush_interval", 1.0)
+        max_pending = persistence.get("max_pending", 500)
+
+        self.store = PatternStore(self.store_path, flush_interval=flush_interval, max_pending=max_pending)
+        self._migrate_learned_patterns()
+        # Pattern types are read from the store the first time they are needed
+        self._patterns: Dict[str, Dict[str, Any]] = {}
+        self._metrics: Dict[str, Dict[str, PatternMetrics]] = {}
+        self._indexes: Dict[str, PatternIndex] = {}
+        self._similarity: Dict[str, PatternSimilarityIndex] = {}
         
         self.integrations = self._load_json(self.integration_path, {
             "active_integrations": {},
             "available_integrations": {},
             "integration_metrics": {}
         })
+        self._integration_writes = WriteBehind(
+            self._write_integrations,
+            interval=flush_interval,
+            name="integrations"
+        )
+
+    def _migrate_learned_patterns(self):
+        """Move a legacy learned_patterns.json into the pattern store once"""
+        if not self.learning_path.exists() or not self.store.is_empty():
+            return
+        with open(self.learning_path, 'r') as f:
+            self.store.import_json(json.load(f))
+        self.learning_path.rename(self.learning_path.with_suffix(".json.migrated"))
+
+    def get_patterns(self, pattern_type: str) -> Dict[str, Any]:
+        """Patterns of one type keyed by id, loaded lazily from the store"""
+        with self._lock:
+            if pattern_type not in self._patterns:
+                rows = self._rekey_legacy_patterns(pattern_type, self.store.load_patterns(pattern_type))
+                patterns = {pattern_id: row["data"] for pattern_id, row in rows.items()}
+                self._metrics[pattern_type] = {
+                    pattern_id: PatternMetrics.from_row(row, self.latency_window)
+                    for pattern_id, row in rows.items()
+                }
+                index = PatternIndex()
+                for pattern_id, pattern in patterns.items():
+                    index.add(pattern_id, pattern)
+                if self.similarity_enabled:
+                    vectors = PatternSimilarityIndex(self.similarity_dim, initial_capacity=max(1024, len(patterns)))
+                    for pattern_id, pattern in patterns.items():
+                        vectors.add(pattern_id, pattern)
+                    self._similarity[pattern_type] = vectors
+                self._patterns[pattern_type] = patterns
+                self._indexes[pattern_type] = index
+            return self._patterns[pattern_type]
+
+    def _rekey_legacy_patterns(self, pattern_type: str, rows: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Merge patterns stored under timestamp ids into one entry per content hash"""
+        merged: Dict[str, Dict[str, Any]] = {}
+        # Counters moved off legacy ids onto their content id, as increments for the store
+        moved: Dict[str, Dict[str, Any]] = {}
+        legacy_ids = []
+        for pattern_id, row in rows.items():
+            content_id = pattern_hash(row["data"])
+            if content_id != pattern_id:
+                legacy_ids.append(pattern_id)
+                if not row["last_seen"]:
+                    row["last_seen"] = _legacy_timestamp(pattern_id)
+                move = moved.setdefault(content_id, {"data": row["data"], "hits": 0, "successes": 0, "last_seen": 0})
+                move["hits"] += row["hits"]
+                move["successes"] += row["successes"]
+                move["last_seen"] = max(move["last_seen"], row["last_seen"])
+            existing = merged.get(content_id)
+            if existing is None:
+                merged[content_id] = row
+            else:
+                existing["hits"] += row["hits"]
+                existing["successes"] += row["successes"]
+                existing["last_seen"] = max(existing["last_seen"], row["last_seen"])
+        if legacy_ids:
+            self.store.write_patterns(pattern_type, upserts=moved, deletes=legacy_ids)
+        return merged
 
     def _load_json(self, path: Path, default: Dict) -> Dict:
         """Load JSON file or create with default values"""
@@ -36,94 +155,256 @@ class AdaptiveConfig:
             json.dump(default, f, indent=2)
         return default
 
-    def learn_pattern(self, pattern_type: str, pattern_data: Dict[str, Any]):
-        """Learn new patterns from successful operations"""
-        timestamp = datetime.now().isoformat()
-        
-        if pattern_type == "code":
-            self.learned_patterns["code_patterns"][timestamp] = pattern_data
-        elif pattern_type == "integration":
-            self.learned_patterns["integration_patterns"][timestamp] = pattern_data
-        elif pattern_type == "execution":
-            self.learned_patterns["execution_patterns"][timestamp] = pattern_data
+    def learn_pattern(self, pattern_type: str, pattern_data: Dict[str, Any], latency: Optional[float] = None):
+        """Learn new patterns from successful operations
 
-        self._save_learned_patterns()
+        Identical contexts share one entry keyed by their content hash;
+        seeing one again only bumps its counters.
+        """
+        with self._lock:
+            if pattern_type in PATTERN_TYPES:
+                patterns = self.get_patterns(pattern_type)
+                pattern_id = pattern_hash(pattern_data)
+                if pattern_id not in patterns:
+                    patterns[pattern_id] = pattern_data
+                    self._metrics[pattern_type][pattern_id] = PatternMetrics(window_size=self.latency_window)
+                    self._indexes[pattern_type].add(pattern_id, pattern_data)
+                    if pattern_type in self._similarity:
+                        self._similarity[pattern_type].add(pattern_id, pattern_data)
+                self._record_hit(pattern_type, pattern_id, True, latency)
+                self._enforce_limit(pattern_type)
 
-    def register_integration(self, integration_data: Dict[str, Any]):
-        """Register new integration capabilities"""
-        integration_id = integration_data.get("id")
-        if integration_id:
-            self.integrations["available_integrations"][integration_id] = {
-                "config": integration_data,
-                "registered_at": datetime.now().isoformat(),
-                "status": "available"
+    def record_outcome(self, pattern_type: str, pattern: Dict[str, Any], success: bool,
+                       latency: Optional[float] = None) -> bool:
+        """Count one execution of a known pattern and its latency in seconds"""
+        with self._lock:
+            if pattern_type not in PATTERN_TYPES:
+                return False
+            pattern_id = pattern_hash(pattern)
+            if pattern_id not in self.get_patterns(pattern_type):
+                return False
+            self._record_hit(pattern_type, pattern_id, success, latency)
+            return True
+
+    def get_pattern_metrics(self, pattern_type: str, pattern: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Counters and latency aggregates of a known pattern"""
+        with self._lock:
+            if pattern_type not in PATTERN_TYPES:
+                return None
+            self.get_patterns(pattern_type)
+            metrics = self._metrics[pattern_type].get(pattern_hash(pattern))
+            return metrics.to_dict() if metrics else None
+
+    def _record_hit(self, pattern_type: str, pattern_id: str, success: bool, latency: Optional[float] = None):
+        metrics = self._metrics[pattern_type][pattern_id]
+        metrics.record(success, latency, now=time.time(), alpha=self.ewma_alpha)
+        # The store adds counters up, so pass this one hit rather than the running totals
+        row = {**metrics.to_row(), "hits": 1, "successes": int(success)}
+        self.store.upsert_pattern(pattern_type, pattern_id, self._patterns[pattern_type][pattern_id], row)
+
+    def _retention_score(self, metrics: PatternMetrics, now: float) -> float:
+        """Higher is more worth keeping: frequent, successful and recently seen patterns"""
+        frequency = 1 + math.log(max(metrics.hits, 1))
+        recency = 0.5 ** (max(now - metrics.last_seen, 0) / self.half_life)
+        return frequency * metrics.success_rate * recency
+
+    def _performance_factor(self, metrics: Optional[PatternMetrics], prior_latency: Optional[float] = None) -> float:
+        """Reliability times speed: the smoothed success rate, discounted by recent latency
+
+        Patterns without latency samples are discounted by `prior_latency`
+        instead, so an untimed pattern neither outranks nor trails timed
+        ones on speed alone.
+        """
+        if metrics is None:
+            return 1.0
+        factor = metrics.success_rate
+        latency = metrics.latency_ewma if metrics.latency_ewma is not None else prior_latency
+        if latency is not None and self.latency_reference:
+            factor /= 1 + latency / self.latency_reference
+        return factor
+
+    @staticmethod
+    def _latency_prior(candidates: List[Optional[PatternMetrics]]) -> Optional[float]:
+        """Median latency EWMA of the candidates that have one"""
+        latencies = [m.latency_ewma for m in candidates if m is not None and m.latency_ewma is not None]
+        return statistics.median(latencies) if latencies else None
+
+    def _enforce_limit(self, pattern_type: str):
+        """Evict the lowest scoring patterns once a type grows past its cap
+
+        Evicting down to (1 - evict_fraction) of the cap keeps the scan
+        from running on every insert.
+        """
+        limit = self.pattern_limits.get(pattern_type)
+        patterns = self._patterns[pattern_type]
+        if not limit or len(patterns) <= limit:
+            return
+
+        now = time.time()
+        metrics = self._metrics[pattern_type]
+        target = int(limit * (1 - self.evict_fraction))
+        victims = heapq.nsmallest(len(patterns) - target, metrics, key=lambda pattern_id: self._retention_score(metrics[pattern_id], now))
+        for pattern_id in victims:
+            evicted = metrics.pop(pattern_id)
+            del patterns[pattern_id]
+            self._indexes[pattern_type].remove(pattern_id)
+            if pattern_type in self._similarity:
+                self._similarity[pattern_type].remove(pattern_id)
+            self._recent_evictions.append({
+                "type": pattern_type,
+                "id": pattern_id,
+                "score": self._retention_score(evicted, now),
+                "hits": evicted.hits,
+                "successes": evicted.successes,
+                "last_seen": evicted.last_seen
+            })
+        self._evicted[pattern_type] += len(victims)
+        self.store.write_patterns(pattern_type, deletes=victims)
+
+    def get_pattern_stats(self) -> Dict[str, Any]:
+        """Pattern counts, caps and eviction history per type"""
+        with self._lock:
+            return {
+                "types": {
+                    pattern_type: {
+                        "loaded": pattern_type in self._patterns,
+                        "patterns": len(self._patterns[pattern_type]) if pattern_type in self._patterns else None,
+                        "limit": self.pattern_limits.get(pattern_type),
+                        "evicted": self._evicted[pattern_type]
+                    }
+                    for pattern_type in PATTERN_TYPES
+                },
+                "evicted_total": sum(self._evicted.values()),
+                "recent_evictions": list(self._recent_evictions)
             }
-            self._save_integrations()
 
-    def _save_learned_patterns(self):
-        """Save learned patterns to file"""
-        with open(self.learning_path, 'w') as f:
-            json.dump(self.learned_patterns, f, indent=2)
+    def register_integration(self, integration_data: Dict[str, Any]):
+        """Register new integration capabilities"""
+        with self._lock:
+            integration_id = integration_data.get("id")
+            if integration_id:
+                self.integrations["available_integrations"][integration_id] = {
+                    "config": integration_data,
+                    "registered_at": datetime.now().isoformat(),
+                    "status": "available"
+                }
+                self._save_integrations()
 
     def _save_integrations(self):
-        """Save integration configurations to file"""
-        with open(self.integration_path, 'w') as f:
-            json.dump(self.integrations, f, indent=2)
+        """Mark integration configurations dirty; the write-behind thread saves them"""
+        self._integration_writes.put("integrations", None)
+
+    def _write_integrations(self, batch: Dict[str, Any]):
+        """Save integration configurations to file atomically"""
+        with self._lock:
+            content = json.dumps(self.integrations, indent=2)
+        tmp_path = self.integration_path.with_suffix(f".{threading.get_ident()}.tmp")
+        try:
+            with open(tmp_path, 'w') as f:
+                f.write(content)
+            os.replace(tmp_path, self.integration_path)
+        except OSError:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+    def flush(self):
+        """Persist every pending pattern, metric and integration update now"""
+        self.store.flush()
+        self._integration_writes.flush()
+
+    def close(self):
+        """Flush pending writes and stop the background writers"""
+        self._integration_writes.close()
+        self.store.close()
 
     def get_best_pattern(self, pattern_type: str, context: Dict[str, Any]) -> Dict[str, Any]:
         """Get the most suitable pattern based on context"""
-        patterns = self.learned_patterns.get(f"{pattern_type}_patterns", {})
-        if not patterns:
-            return {}
-
-        # Score each pattern based on context similarity
-        scored_patterns = []
-        for timestamp, pattern in patterns.items():
-            score = self._calculate_pattern_score(pattern, context)
-            scored_patterns.append((score, pattern))
-
-        # Return the highest scoring pattern
-        if scored_patterns:
-            return max(scored_patterns, key=lambda x: x[0])[1]
-        return {}
-
-    def _calculate_pattern_score(self, pattern: Dict[str, Any], context: Dict[str, Any]) -> float:
-        """Calculate how well a pattern matches the current context"""
-        score = 0.0
-        
-        # Match context keys
-        common_keys = set(pattern.keys()) & set(context.keys())
-        score += len(common_keys) / max(len(pattern), len(context))
-        
-        # Match values for common keys
-        for key in common_keys:
-            if pattern[key] == context[key]:
-                score += 1.0
-                
-        return score
+        top = self.get_top_patterns(pattern_type, context, k=1)
+        return top[0]["pattern"] if top else {}
+
+    def get_top_patterns(self, pattern_type: str, context: Dict[str, Any], k: int = 5,
+                         method: str = None) -> List[Dict[str, Any]]:
+        """Get the k best matching patterns, best first
+
+        "exact" scores patterns sharing at least one key with the context:
+        the share of common keys plus one point per equal value.
+        "similarity" ranks every pattern by cosine similarity of hashed
+        key/value vectors, so near matches are found too. The default is
+        similarity when it is enabled in settings.json.
+
+        The best `candidates` by relevance are then re-ranked by relevance
+        times success rate, discounted by latency, so among similar
+        matches the fastest reliable pattern wins. Candidates not yet
+        timed are discounted by the median latency of those that are.
+        """
+        with self._lock:
+            patterns = self.get_patterns(pattern_type)
+            if not patterns:
+                return []
+
+            method = method or ("similarity" if self.similarity_enabled else "exact")
+            candidates = max(k, self.ranking_candidates)
+            if method == "similarity" and pattern_type in self._similarity:
+                ranked = self._similarity[pattern_type].top_k(context, candidates)
+            else:
+                ranked = self._indexes[pattern_type].top_k(context, candidates)
+
+            metrics = self._metrics[pattern_type]
+            # Untimed candidates are assumed as fast as the typical timed one they compete with
+            prior = self._latency_prior([metrics.get(pattern_id) for _, pattern_id in ranked])
+            scored = [
+                (relevance * self._performance_factor(metrics.get(pattern_id), prior), relevance, pattern_id)
+                for relevance, pattern_id in ranked
+            ]
+            # Stable sort keeps the index's tie order (oldest first)
+            scored.sort(key=lambda item: item[0], reverse=True)
+            return [
+                {
+                    "id": pattern_id,
+                    "score": score,
+                    "relevance": relevance,
+                    "pattern": patterns[pattern_id],
+                    "metrics": metrics[pattern_id].to_dict()
+                }
+                for score, relevance, pattern_id in scored[:k]
+            ]
 
     def adapt_to_feedback(self, feedback: Dict[str, Any]):
-        """Adapt configurations based on feedback"""
+        """Adapt configurations based on feedback
+
+        Besides "type", "success" and "context", feedback may carry the
+        "pattern" that was executed and its "latency" in seconds. The
+        outcome is counted on that pattern; without one it is counted on
+        the context itself.
+        """
         pattern_type = feedback.get("type")
         success = feedback.get("success", False)
         context = feedback.get("context", {})
+        pattern = feedback.get("pattern")
+        latency = feedback.get("latency")
         
-        if success:
-            # Learn from successful patterns
-            self.learn_pattern(pattern_type, context)
-        else:
-            # Update metrics for unsuccessful patterns
-            self._update_failure_metrics(pattern_type, context)
-
-    def _update_failure_metrics(self, pattern_type: str, context: Dict[str, Any]):
+        with self._lock:
+            if pattern and pattern_hash(pattern) != pattern_hash(context):
+                self.record_outcome(pattern_type, pattern, success, latency)
+                latency = None
+
+            if success:
+                # Learn from successful patterns
+                self.learn_pattern(pattern_type, context, latency)
+            else:
+                # Update metrics for unsuccessful patterns
+                self._update_failure_metrics(pattern_type, context, latency)
+
+    def _update_failure_metrics(self, pattern_type: str, context: Dict[str, Any], latency: Optional[float] = None):
         """Update metrics for failed patterns"""
-        metrics = self.learned_patterns["success_metrics"]
-        pattern_metrics = metrics.setdefault(pattern_type, {})
-        
-        # Update failure count
-        pattern_key = json.dumps(sorted(context.items()))
-        current_metric = pattern_metrics.get(pattern_key, {"success": 0, "failure": 0})
-        current_metric["failure"] += 1
-        pattern_metrics[pattern_key] = current_metric
-        
-        self._save_learned_patterns() 
\ No newline at end of file
+        # Known patterns count the failure on their own metrics; others keep the legacy counter
+        if not self.record_outcome(pattern_type, context, False, latency):
+            pattern_key = json.dumps(sorted(context.items()))
+            self.store.increment_metric(pattern_type, pattern_key, failure=1)
+
+def _legacy_timestamp(pattern_id: str) -> float:
+    """Patterns used to be keyed by datetime.now().isoformat(); recover when they were learned"""
+    try:
+        return datetime.fromisoformat(pattern_id).timestamp()
+    except ValueError:
+        return 0.0
\ No newline at end of file
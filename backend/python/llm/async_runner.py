@@ -0,0 +1,142 @@
+from typing import Dict, Any, AsyncIterator, Awaitable, Iterator, Optional
+from concurrent.futures import Future
+import asyncio
+import contextlib
+import queue
+import threading
+
+class AsyncRunner:
+    """One long-lived event loop on a background thread shared by every request
+
+    Synchronous request handlers submit LLMService coroutines here and
+    wait on the returned future, so all requests in a process share one
+    loop: their model calls can be batched together and the loop keeps
+    many of them in flight while inference runs in the worker pool.
+    `max_concurrency` bounds how many coroutines run at once; the rest
+    queue on a semaphore.
+    """
+
+    def __init__(self, max_concurrency: int = 32, name: str = "async-runner"):
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._waiting = 0
+        self.completed = 0
+        self.failed = 0
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        # Started on first use so a pre-fork master never owns the loop thread
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name=self.name, daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def submit(self, coro: Awaitable[Any], limited: bool = True) -> Future:
+        """Schedule a coroutine on the shared loop, under the concurrency limit unless `limited` is False
+
+        A coroutine that takes slot() itself for each unit of work it
+        fans out, such as a batch, is submitted unlimited so it does not
+        hold a slot while its items wait for theirs.
+        """
+        return asyncio.run_coroutine_threadsafe(self._limited(coro) if limited else coro, self.loop)
+
+    def run(self, coro: Awaitable[Any], timeout: Optional[float] = None, limited: bool = True) -> Any:
+        """Run a coroutine on the shared loop and block the calling thread for its result"""
+        future = self.submit(coro, limited)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            future.cancel()
+            raise
+
+    def iterate(self, agen: AsyncIterator[Any]) -> Iterator[Any]:
+        """Drive an async generator on the shared loop from a synchronous generator
+
+        The whole stream holds one concurrency slot. Closing the returned
+        generator, e.g. when the client disconnects, cancels the stream.
+        """
+        items: "queue.Queue" = queue.Queue()
+        finished = object()
+
+        async def pump():
+            try:
+                async for item in agen:
+                    items.put(item)
+            finally:
+                items.put(finished)
+                await agen.aclose()
+
+        future = self.submit(pump())
+        try:
+            while True:
+                item = items.get()
+                if item is finished:
+                    break
+                yield item
+            future.result()
+        finally:
+            future.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self._in_flight,
+            "waiting": self._waiting,
+            "completed": self.completed,
+            "failed": self.failed
+        }
+
+    def shutdown(self, timeout: Optional[float] = 5):
+        """Stop the loop thread; coroutines still running are abandoned"""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = self._semaphore = None
+        if loop is None:
+            return
+        loop.call_soon_threadsafe(loop.stop)
+        if thread is not None:
+            thread.join(timeout)
+        if not loop.is_running():
+            loop.close()
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        """Hold one of the `max_concurrency` slots for the duration of the block; loop thread only"""
+        # Created on the loop thread, so it binds to the loop it is used on
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        semaphore = self._semaphore
+        self._waiting += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self._waiting -= 1
+
+        self._in_flight += 1
+        try:
+            yield
+            self.completed += 1
+        except BaseException:
+            self.failed += 1
+            raise
+        finally:
+            self._in_flight -= 1
+            semaphore.release()
+
+    async def _limited(self, coro: Awaitable[Any]) -> Any:
+        started = False
+        try:
+            async with self.slot():
+                started = True
+                return await coro
+        finally:
+            # Cancelled while queued: the coroutine never started
+            if not started and asyncio.iscoroutine(coro):
+                coro.close()
\ No newline at end of file
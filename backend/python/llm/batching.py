@@ -0,0 +1,71 @@
+from typing import Dict, Any, List, Tuple, Callable, Awaitable, Optional
+import asyncio
+
+class BatchScheduler:
+    """Coalesces concurrent prompts for one model into batched generate calls
+
+    Prompts submitted within `window_ms` of each other (or until
+    `max_batch_size` is reached) are handed to `run_batch` together and
+    each caller receives the result at its own position.
+    """
+
+    def __init__(self, run_batch: Callable[[List[str]], Awaitable[List[Any]]],
+                 max_batch_size: int = 8, window_ms: float = 20):
+        self.run_batch = run_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.window = max(0.0, window_ms / 1000.0)
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.batches = 0
+        self.requests = 0
+
+    async def submit(self, prompt: str) -> Any:
+        """Queue a prompt and wait for its share of the batched result"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((prompt, future))
+        self.requests += 1
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+
+        return await future
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "pending": len(self._pending),
+            "avg_batch_size": round(self.requests / self.batches, 2) if self.batches else 0.0
+        }
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        # Drop callers that gave up while waiting for the window to close
+        self._pending = [(prompt, future) for prompt, future in self._pending if not future.done()]
+        batch = self._pending[:self.max_batch_size]
+        self._pending = self._pending[self.max_batch_size:]
+        if batch:
+            self.batches += 1
+            asyncio.ensure_future(self._run(batch))
+        if self._pending:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._flush)
+
+    async def _run(self, batch: List[Tuple[str, asyncio.Future]]):
+        prompts = [prompt for prompt, _ in batch]
+        try:
+            results = await self.run_batch(prompts)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
\ No newline at end of file
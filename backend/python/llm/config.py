@@ -1,3 +1,4 @@
+import json
 import os
 from pathlib import Path
 
@@ -38,6 +39,35 @@ class LLMConfig:
         "timeout": 30,  # seconds
         "max_retries": 3
     }
+    
+    # Serving Configuration
+    SERVING_CONFIG = {
+        # LLM pipelines in flight at once per worker process; the rest queue
+        "max_concurrency": int(os.getenv("LLM_MAX_CONCURRENCY", "32")),
+        "request_timeout": float(os.getenv("LLM_REQUEST_TIMEOUT", "300")),  # seconds
+        # Batch endpoints: largest accepted batch and pipelines in flight per batch
+        "batch_max_items": int(os.getenv("LLM_BATCH_MAX_ITEMS", "500")),
+        "batch_concurrency": int(os.getenv("LLM_BATCH_CONCURRENCY", "8")),
+        # Idle task event streams send a keep-alive comment this often
+        "event_heartbeat": float(os.getenv("EVENT_HEARTBEAT_SECONDS", "15")),  # seconds
+        # How often task event streams read other workers' changes from a shared task store
+        "event_poll": float(os.getenv("EVENT_POLL_SECONDS", "1"))  # seconds
+    }
+    
+    # Task Execution Configuration
+    TASK_EXECUTOR_CONFIG = {
+        "workers": int(os.getenv("TASK_WORKERS", "4")),
+        # Per task type cap on concurrently running tasks, e.g. TASK_TYPE_LIMITS='{"deployment": 1}'
+        "type_limits": json.loads(os.getenv("TASK_TYPE_LIMITS", "{}"))
+    }
+    
+    # Task Store Configuration
+    TASK_STORE_CONFIG = {
+        # SQLite file tasks are persisted to; empty keeps tasks in memory only
+        "path": os.getenv("TASK_STORE_PATH", str(BASE_DIR / "data" / "tasks.db")),
+        # Finished tasks kept in memory before reads go to the store
+        "max_finished": int(os.getenv("TASK_MAX_FINISHED", "1000"))
+    }
 
     @classmethod
     def initialize(cls):
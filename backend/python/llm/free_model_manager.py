@@ -3,6 +3,8 @@ import torch
 from transformers import AutoModelForCausalLM, AutoTokenizer, pipeline
 from pathlib import Path
 import json
+from .inference_pool import InferencePool
+from .quantization import load_int8_model
 
 class FreeModelManager:
     def __init__(self):
@@ -10,6 +12,11 @@ class FreeModelManager:
         self.config_path.mkdir(parents=True, exist_ok=True)
         self.models_config = self._load_models_config()
         self.local_models = {}
+        pool_config = self.models_config.get("inference_pool", {})
+        self.inference_pool = InferencePool(
+            workers=pool_config.get("workers"),
+            torch_threads=pool_config.get("torch_threads")
+        )
         self._initialize_models()
 
     def _initialize_models(self):
@@ -19,12 +26,15 @@ class FreeModelManager:
             model_name = "gpt2"  # Start with smallest model
             config = self.models_config["local_models"][model_name]
             
-            # Use smaller precision and efficient loading
-            model = AutoModelForCausalLM.from_pretrained(
-                config["path"],
-                torch_dtype=torch.float16,
-                low_cpu_mem_usage=True
-            )
+            if config.get("quantization") == "int8":
+                model = load_int8_model(config["path"], config.get("quantized_path"))
+            else:
+                # float16 matmuls are emulated and slow on CPU, so only use them on a GPU
+                model = AutoModelForCausalLM.from_pretrained(
+                    config["path"],
+                    torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32,
+                    low_cpu_mem_usage=True
+                )
             tokenizer = AutoTokenizer.from_pretrained(config["path"])
             
             self.local_models[model_name] = {
@@ -39,25 +49,7 @@ class FreeModelManager:
     async def generate(self, prompt: str) -> Dict[str, Any]:
         """Generate response using available free model"""
         try:
-            model_name = "gpt2"  # Use the smallest model
-            model_data = self.local_models[model_name]
-            
-            inputs = model_data["tokenizer"](
-                prompt, 
-                return_tensors="pt", 
-                max_length=512,
-                truncation=True
-            )
-            
-            outputs = model_data["model"].generate(
-                **inputs,
-                max_length=512,
-                num_return_sequences=1,
-                temperature=0.7,
-                pad_token_id=model_data["tokenizer"].eos_token_id
-            )
-            
-            response = model_data["tokenizer"].decode(outputs[0], skip_special_tokens=True)
+            response = await self.inference_pool.run(self._generate_sync, prompt)
             return {
                 "success": True,
                 "response": response,
@@ -70,9 +62,36 @@ class FreeModelManager:
                 "error": str(e)
             }
 
+    def _generate_sync(self, prompt: str) -> str:
+        """Blocking tokenize, generate and decode; runs on the inference pool"""
+        model_name = "gpt2"  # Use the smallest model
+        model_data = self.local_models[model_name]
+        
+        inputs = model_data["tokenizer"](
+            prompt, 
+            return_tensors="pt", 
+            max_length=512,
+            truncation=True
+        )
+        
+        outputs = model_data["model"].generate(
+            **inputs,
+            max_length=512,
+            num_return_sequences=1,
+            temperature=0.7,
+            pad_token_id=model_data["tokenizer"].eos_token_id
+        )
+        
+        return model_data["tokenizer"].decode(outputs[0], skip_special_tokens=True)
+
     def load_quantized_model(self, model_name: str):
-        """Load 4-bit quantized model for memory efficiency"""
+        """Load a quantized model: bitsandbytes 4-bit on GPU, dynamic int8 on CPU"""
         try:
+            config = self.models_config["local_models"][model_name]
+            if not torch.cuda.is_available():
+                # bitsandbytes needs CUDA; CPU-only nodes get int8 linear layers instead
+                return load_int8_model(config["path"], config.get("quantized_path"))
+
             from transformers import BitsAndBytesConfig
             
             quantization_config = BitsAndBytesConfig(
@@ -81,7 +100,7 @@ class FreeModelManager:
             )
             
             model = AutoModelForCausalLM.from_pretrained(
-                self.models_config["local_models"][model_name]["path"],
+                config["path"],
                 quantization_config=quantization_config,
                 device_map="auto"
             )
@@ -0,0 +1,69 @@
+from typing import Dict, Any, Optional, Callable
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import functools
+import os
+import threading
+import torch
+
+class InferencePool:
+    """Dedicated worker threads for blocking tokenizer and model calls
+
+    Torch releases the GIL inside its kernels, so a thread pool lets
+    several generations overlap without copying model weights into
+    other processes. Each worker caps its intra-op threads so the pool
+    as a whole does not oversubscribe the available cores.
+    """
+
+    def __init__(self, workers: Optional[int] = None, torch_threads: Optional[int] = None):
+        cpu_count = os.cpu_count() or 1
+        self.workers = max(1, int(workers or 2))
+        self.torch_threads = max(1, int(torch_threads or cpu_count // self.workers or 1))
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._active = 0
+        self.completed = 0
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        # Created on first use so a pre-fork master never owns worker threads
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers,
+                    thread_name_prefix="inference",
+                    initializer=self._initialize_worker
+                )
+            return self._executor
+
+    def _initialize_worker(self):
+        torch.set_num_threads(self.torch_threads)
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a blocking call on the pool without blocking the event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(self._call, fn, *args, **kwargs))
+
+    def _call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        with self._lock:
+            self._active += 1
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._active -= 1
+                self.completed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "torch_threads": self.torch_threads,
+            "active": self._active,
+            "completed": self.completed
+        }
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
\ No newline at end of file
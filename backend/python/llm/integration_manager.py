@@ -1,12 +1,13 @@
 from typing import Dict, Any, Optional
 from .adaptive_config import AdaptiveConfig
+from .service_registry import ServiceRegistry
 import importlib
 import sys
 from pathlib import Path
 
 class IntegrationManager:
-    def __init__(self):
-        self.adaptive_config = AdaptiveConfig()
+    def __init__(self, adaptive_config: Optional[AdaptiveConfig] = None):
+        self.adaptive_config = adaptive_config or ServiceRegistry.adaptive_config()
         self.integration_path = Path("integrations")
         self.integration_path.mkdir(exist_ok=True)
 
@@ -1,56 +1,166 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, AsyncIterator, AsyncContextManager, Callable
+import asyncio
+import contextlib
 import openai
 import json
 import os
 from pathlib import Path
 import importlib.util
 import ast
-from adaptive_config import AdaptiveConfig
+import time
+from .adaptive_config import AdaptiveConfig
 from .model_manager import ModelManager
+from .service_registry import ServiceRegistry
+from .metrics import REQUEST_SECONDS, STAGE_SECONDS
+
+CONTEXT_PROMPT = "Extract key context elements from this input: "
+SOLUTION_PROMPT = "Generate a complete solution including: 1. Code implementation 2. Integration points 3. Execution strategy 4. Error handling"
+VALIDATION_PROMPT = "Validate this solution for: 1. Security issues 2. Best practices 3. Error handling 4. Performance considerations"
+INTENT_PROMPT = "You are an AI assistant specialized in: 1. Code generation and modification 2. System integration 3. Task automation Analyze the user request and determine the required action."
+CODE_GENERATION_PROMPT = "Generate production-ready code based on the request. Include: 1. Code implementation 2. Tests 3. Documentation 4. Integration points"
+INTEGRATION_PROMPT = "Analyze the integration requirements and provide: 1. Required APIs 2. Authentication methods 3. Data mapping 4. Integration code"
+SECURITY_PROMPT = "Analyze this code for security issues including: 1. Potential vulnerabilities 2. Unsafe operations 3. Resource leaks 4. Input validation Return a detailed security analysis."
+CATEGORIZE_PROMPT = "Categorize this request into one of: 1. Code generation 2. Integration 3. Task creation Provide the category and confidence score."
+
+# Constant instructions every stage starts with; their prefill is computed once per model
+PROMPT_PREFIXES = (
+    CONTEXT_PROMPT, SOLUTION_PROMPT, VALIDATION_PROMPT, INTENT_PROMPT,
+    CODE_GENERATION_PROMPT, INTEGRATION_PROMPT, SECURITY_PROMPT, CATEGORIZE_PROMPT
+)
 
 class LLMService:
-    def __init__(self):
-        self.model_manager = ModelManager()
-        self.adaptive_config = AdaptiveConfig()
+    def __init__(self, model_manager: Optional[ModelManager] = None,
+                 adaptive_config: Optional[AdaptiveConfig] = None):
+        self.model_manager = model_manager or ServiceRegistry.model_manager()
+        for prefix in PROMPT_PREFIXES:
+            self.model_manager.register_prompt_prefix(prefix)
+        self.adaptive_config = adaptive_config or ServiceRegistry.adaptive_config()
         self.code_generation_path = Path("generated_code")
         self.code_generation_path.mkdir(exist_ok=True)
         
     async def process_input(self, user_input: str) -> Dict[str, Any]:
-        try:
-            # Get context from the input
-            context = await self._extract_context(user_input)
-            
-            # Find best matching pattern
+        with REQUEST_SECONDS.time(outcome="error") as span:
+            try:
+                # Get context from the input
+                context = await self._extract_context(user_input)
+                result = await self._process_context(context)
+                span["outcome"] = "success" if result.get("success") else "failure"
+                return result
+            except Exception as e:
+                return {
+                    "success": False,
+                    "error": str(e)
+                }
+
+    async def process_many(self, user_inputs: List[str], max_concurrency: int = 8,
+                           item_timeout: Optional[float] = None,
+                           slot: Optional[Callable[[], AsyncContextManager]] = None) -> List[Dict[str, Any]]:
+        """Run process_input over many inputs, returning one result per input in order
+
+        Each input is its own pipeline, at most `max_concurrency` at a
+        time; running together, their model calls meet in the batch
+        scheduler and share generate calls. An item that runs longer than
+        `item_timeout` seconds fails alone. `slot`, e.g. AsyncRunner.slot,
+        is held by every running item so batch items count against the
+        same limit as single requests.
+        """
+        semaphore = asyncio.Semaphore(max(1, int(max_concurrency)))
+
+        async def run(user_input: str) -> Dict[str, Any]:
+            async with semaphore, (slot() if slot else contextlib.nullcontext()):
+                try:
+                    return await asyncio.wait_for(self.process_input(user_input), item_timeout)
+                except asyncio.TimeoutError:
+                    return {"success": False, "error": f"Timed out after {item_timeout}s"}
+
+        return list(await asyncio.gather(*(run(user_input) for user_input in user_inputs)))
+
+    async def _process_context(self, context: Dict[str, Any]) -> Dict[str, Any]:
+        """Run the pattern, solution and feedback stages for an extracted context"""
+        async for event in self._run_stages(context, self._solve):
+            result = event["result"]
+        return result
+
+    async def process_input_stream(self, user_input: str) -> AsyncIterator[Dict[str, Any]]:
+        """Stream solution tokens as they are generated, then the final result"""
+        with REQUEST_SECONDS.time(outcome="error") as span:
+            try:
+                context = await self._extract_context(user_input)
+                async for event in self._run_stages(context, self._solve_streaming):
+                    if event["event"] == "done":
+                        span["outcome"] = "success" if event["result"].get("success") else "failure"
+                    yield event
+            except Exception as e:
+                yield {
+                    "event": "done",
+                    "result": {"success": False, "error": str(e)}
+                }
+
+    async def _run_stages(self, context: Dict[str, Any],
+                          solve: Callable[[Dict[str, Any]], AsyncIterator[Dict[str, Any]]]) -> AsyncIterator[Dict[str, Any]]:
+        """Find a pattern, execute it or solve anew, and learn from the outcome, timing each stage
+
+        `solve(context)` generates a new solution when no pattern matches.
+        It yields any {"event": "token"} events, which are passed on, then
+        {"event": "done", "result": ...}. The last event is always the
+        done event with the stage result.
+        """
+        # Find best matching pattern
+        with STAGE_SECONDS.time(stage="get_best_pattern"):
             pattern = self.adaptive_config.get_best_pattern("execution", context)
-            
-            if pattern:
-                # Use existing pattern
+        
+        start = time.perf_counter()
+        if pattern:
+            # Use existing pattern; nothing is generated, so there is nothing to stream
+            with STAGE_SECONDS.time(stage="execute_pattern"):
                 result = await self._execute_pattern(pattern, context)
-            else:
-                # Generate new solution
-                result = await self._generate_new_solution(context)
-                
-            # Learn from the execution
+        else:
+            # Generate new solution (includes the validate_solution stage and
+            # the time a streaming client takes to read the tokens)
+            with STAGE_SECONDS.time(stage="generate_new_solution"):
+                async for event in solve(context):
+                    if event["event"] == "done":
+                        result = event["result"]
+                    else:
+                        yield event
+            
+        # Learn from the execution
+        with STAGE_SECONDS.time(stage="adapt_to_feedback"):
             self.adaptive_config.adapt_to_feedback({
                 "type": "execution",
                 "success": result.get("success", False),
-                "context": context
+                "context": context,
+                "pattern": pattern,
+                "latency": time.perf_counter() - start
             })
-            
-            return result
-        except Exception as e:
-            return {
-                "success": False,
-                "error": str(e)
-            }
+        
+        yield {"event": "done", "result": result}
+
+    async def _solve(self, context: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        yield {"event": "done", "result": await self._generate_new_solution(context)}
+
+    async def _solve_streaming(self, context: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        solution = ""
+        async for event in self.model_manager.generate_stream(
+            prompt=SOLUTION_PROMPT,
+            model_preference="local/codellama"  # Prefer local CodeLlama for code understanding
+        ):
+            if event.get("done"):
+                solution = event["response"]
+            else:
+                yield {"event": "token", "token": event["token"]}
+        yield {"event": "done", "result": await self._apply_solution(solution, context)}
 
     async def _extract_context(self, user_input: str) -> Dict[str, Any]:
         """Extract context using available models"""
-        response = await self.model_manager.generate(
-            prompt="Extract key context elements from this input: " + user_input,
-            model_preference="local/codellama"  # Prefer local CodeLlama for code understanding
-        )
-        
+        with STAGE_SECONDS.time(stage="extract_context"):
+            response = await self.model_manager.generate(
+                prompt=CONTEXT_PROMPT + user_input,
+                model_preference="local/codellama"  # Prefer local CodeLlama for code understanding
+            )
+        return self._parse_context(response, user_input)
+
+    def _parse_context(self, response: Dict[str, Any], user_input: str) -> Dict[str, Any]:
         try:
             return json.loads(response["response"])
         except:
@@ -76,38 +186,40 @@ class LLMService:
         try:
             # Generate solution using LLM
             response = await self.model_manager.generate(
-                prompt="Generate a complete solution including: 1. Code implementation 2. Integration points 3. Execution strategy 4. Error handling",
+                prompt=SOLUTION_PROMPT,
                 model_preference="local/codellama"  # Prefer local CodeLlama for code understanding
             )
             
-            solution = response["response"]
-            
-            # Validate and execute the solution
-            if await self._validate_solution(solution):
-                result = await self._execute_solution(solution, context)
-                
-                # If successful, learn the pattern
-                if result.get("success"):
-                    self.adaptive_config.learn_pattern("execution", {
-                        "context": context,
-                        "solution": solution,
-                        "result": result
-                    })
-                
-                return result
-            
-            return {"success": False, "error": "Solution validation failed"}
+            return await self._apply_solution(response["response"], context)
         except Exception as e:
             return {"success": False, "error": str(e)}
 
+    async def _apply_solution(self, solution: str, context: Dict[str, Any]) -> Dict[str, Any]:
+        """Validate and execute a generated solution, learning it on success"""
+        if await self._validate_solution(solution):
+            result = await self._execute_solution(solution, context)
+            
+            # If successful, learn the pattern
+            if result.get("success"):
+                self.adaptive_config.learn_pattern("execution", {
+                    "context": context,
+                    "solution": solution,
+                    "result": result
+                })
+            
+            return result
+        
+        return {"success": False, "error": "Solution validation failed"}
+
     async def _validate_solution(self, solution: str) -> bool:
         """Validate generated solution"""
         try:
             # Use LLM to validate the solution
-            response = await self.model_manager.generate(
-                prompt="Validate this solution for: 1. Security issues 2. Best practices 3. Error handling 4. Performance considerations",
-                model_preference="local/codellama"  # Prefer local CodeLlama for code understanding
-            )
+            with STAGE_SECONDS.time(stage="validate_solution"):
+                response = await self.model_manager.generate(
+                    prompt=VALIDATION_PROMPT,
+                    model_preference="local/codellama"  # Prefer local CodeLlama for code understanding
+                )
             
             validation_result = response["response"]
             return "VALID" in validation_result.upper()
@@ -117,7 +229,7 @@ class LLMService:
     async def _analyze_intent(self, user_input: str) -> Dict[str, Any]:
         """Analyze user input to determine the required action"""
         response = await self.model_manager.generate(
-            prompt="You are an AI assistant specialized in: 1. Code generation and modification 2. System integration 3. Task automation Analyze the user request and determine the required action.",
+            prompt=INTENT_PROMPT,
             model_preference="local/codellama"  # Prefer local CodeLlama for code understanding
         )
         
@@ -128,7 +240,7 @@ class LLMService:
     async def _handle_code_generation(self, intent: Dict[str, Any], user_input: str) -> Dict[str, Any]:
         """Handle dynamic code generation and deployment"""
         response = await self.model_manager.generate(
-            prompt="Generate production-ready code based on the request. Include: 1. Code implementation 2. Tests 3. Documentation 4. Integration points",
+            prompt=CODE_GENERATION_PROMPT,
             model_preference="local/codellama"  # Prefer local CodeLlama for code understanding
         )
         
@@ -155,7 +267,7 @@ class LLMService:
         """Handle third-party service integration"""
         # Get integration details from LLM
         response = await self.model_manager.generate(
-            prompt="Analyze the integration requirements and provide: 1. Required APIs 2. Authentication methods 3. Data mapping 4. Integration code",
+            prompt=INTEGRATION_PROMPT,
             model_preference="local/codellama"  # Prefer local CodeLlama for code understanding
         )
         
@@ -217,7 +329,7 @@ class LLMService:
         """Perform security analysis on generated code"""
         # Ask LLM to analyze code for security concerns
         response = await self.model_manager.generate(
-            prompt="Analyze this code for security issues including: 1. Potential vulnerabilities 2. Unsafe operations 3. Resource leaks 4. Input validation Return a detailed security analysis.",
+            prompt=SECURITY_PROMPT,
             model_preference="local/codellama"  # Prefer local CodeLlama for code understanding
         )
         
@@ -259,7 +371,7 @@ class LLMService:
         """Categorize the intent of the user request"""
         # Ask LLM to categorize the intent
         response = await self.model_manager.generate(
-            prompt="Categorize this request into one of: 1. Code generation 2. Integration 3. Task creation Provide the category and confidence score.",
+            prompt=CATEGORIZE_PROMPT,
             model_preference="local/codellama"  # Prefer local CodeLlama for code understanding
         )
         
@@ -0,0 +1,193 @@
+from typing import Dict, Any, Callable, Iterator, List, Optional, Sequence, Tuple
+from contextlib import contextmanager
+import bisect
+import math
+import os
+import threading
+import time
+
+# Seconds; spans from a cache hit (sub-millisecond) up to a slow local generate
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+def _format_labels(names: Sequence[str], values: Sequence[str], *extra: Tuple[str, str]) -> str:
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+        for name, value in pairs
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+class Counter:
+    """Monotonic count per label combination"""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: Any):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(tuple(str(labels.get(name, "")) for name in self.labelnames), 0)
+
+    def render(self, *extra: Tuple[str, str]) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key, *extra)} {_format_value(value)}")
+        return lines
+
+class Histogram:
+    """Bucketed observations (cumulative on render) per label combination
+
+    observe() is a bisect plus a few additions under a lock, so timing
+    every stage of every request costs microseconds.
+    """
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label key -> [per-bucket counts (last is +Inf), sum, count]
+        self._series: Dict[Tuple[str, ...], List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: Any):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][position] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[Dict[str, Any]]:
+        """Observe the duration of the block; labels may be filled in inside it
+
+            with REQUEST_SECONDS.time(outcome="error") as span:
+                ...
+                span["outcome"] = "success"
+        """
+        span = dict(labels)
+        start = time.perf_counter()
+        try:
+            yield span
+        finally:
+            self.observe(time.perf_counter() - start, **span)
+
+    def snapshot(self, **labels: Any) -> Optional[Dict[str, Any]]:
+        series = self._series.get(tuple(str(labels.get(name, "")) for name in self.labelnames))
+        if series is None:
+            return None
+        return {"count": series[2], "sum": series[1], "buckets": dict(zip(self.buckets + (math.inf,), series[0]))}
+
+    def render(self, *extra: Tuple[str, str]) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(key, list(counts), total, count) for key, (counts, total, count) in self._series.items()]
+        for key, counts, total, count in sorted(series):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, *extra, ("le", _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key, *extra)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+class MetricsRegistry:
+    """Named metrics plus gauge collectors, rendered in the Prometheus text format
+
+    Gauge collectors are callables returning a flat dict of numbers, such
+    as the stats() of the async runner or the task executor; they are
+    only called when the registry is rendered.
+
+    Each pre-forked worker process has its own registry and a scrape
+    reaches whichever worker serves it, so every rendered series carries
+    a `pid` label; summing over it gives the service-wide figures.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self._collectors: Dict[str, Callable[[], Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(name, lambda: Counter(name, help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(name, lambda: Histogram(name, help_text, labelnames, buckets))
+
+    def register_gauges(self, prefix: str, collect: Callable[[], Dict[str, Any]]):
+        """Expose the numeric values of `collect()` as gauges named {prefix}_{key}"""
+        with self._lock:
+            self._collectors[prefix] = collect
+
+    def render(self) -> str:
+        process = ("pid", str(os.getpid()))
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render(process))
+        for prefix, collect in list(self._collectors.items()):
+            try:
+                values = collect()
+            except Exception as e:
+                print(f"Failed to collect {prefix} metrics: {str(e)}")
+                continue
+            for key, value in values.items():
+                # Booleans and nested or missing values are not gauges
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                name = f"{prefix}_{key}"
+                lines.extend([f"# TYPE {name} gauge", f"{name}{_format_labels((), (), process)} {_format_value(value)}"])
+        return "\n".join(lines) + "\n"
+
+    def _register(self, name: str, create: Callable[[], Any]) -> Any:
+        # Re-registering returns the existing metric, so module reloads keep their series
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = create()
+            return self._metrics[name]
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "llm_stage_duration_seconds",
+    "Duration of each LLMService pipeline stage",
+    ["stage"]
+)
+REQUEST_SECONDS = REGISTRY.histogram(
+    "llm_request_duration_seconds",
+    "Duration of a whole LLMService pipeline run",
+    ["outcome"]
+)
+GENERATE_SECONDS = REGISTRY.histogram(
+    "llm_generate_duration_seconds",
+    "Duration of each backend attempt made by ModelManager.generate",
+    ["model", "cache", "outcome"]
+)
+TOKENS = REGISTRY.counter(
+    "llm_tokens_total",
+    "Tokens processed by model backends",
+    ["model", "kind"]
+)
\ No newline at end of file
@@ -1,17 +1,65 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List, AsyncIterator, Callable, Tuple
+from concurrent.futures import ThreadPoolExecutor, Future
+import asyncio
+import copy
+import gc
+import threading
+import time
+import weakref
 import torch
-from transformers import AutoModelForCausalLM, AutoTokenizer
+from transformers import AutoModelForCausalLM, AutoTokenizer, StoppingCriteriaList
 import openai
 from pathlib import Path
 import json
+from .model_registry import ModelRegistry
+from .batching import BatchScheduler
+from .inference_pool import InferencePool
+from .streaming import CallbackTextStreamer, CancelCriteria
+from .response_cache import ResponseCache
+from .prefix_cache import PrefixCache
+from .resilience import CircuitBreaker
+from .quantization import load_int8_model
+from .preload import load_mmap_model, memory_usage
+from .metrics import GENERATE_SECONDS, TOKENS
 
 class ModelManager:
     def __init__(self):
         self.config_path = Path("config/models")
         self.config_path.mkdir(parents=True, exist_ok=True)
         self.models_config = self._load_models_config()
-        self.local_models = {}
+        registry_config = self.models_config.get("model_registry", {})
+        self.model_registry = ModelRegistry(
+            memory_budget_mb=registry_config.get("memory_budget_mb")
+        )
+        pool_config = self.models_config.get("inference_pool", {})
+        self.inference_pool = InferencePool(
+            workers=pool_config.get("workers"),
+            torch_threads=pool_config.get("torch_threads")
+        )
+        self.batching_config = self.models_config.get("batching", {})
+        self.preload_config = self.models_config.get("preload", {})
+        cache_config = self.models_config.get("response_cache", {})
+        self.response_cache = ResponseCache(
+            max_entries=cache_config.get("max_entries", 1024),
+            ttl_seconds=cache_config.get("ttl_seconds", 3600),
+            disk_path=cache_config.get("disk_path"),
+            max_disk_entries=cache_config.get("max_disk_entries", 10000)
+        ) if cache_config.get("enabled", True) else None
+        prefix_config = self.models_config.get("prefix_cache", {})
+        self.prefix_cache = PrefixCache() if prefix_config.get("enabled", True) else None
+        if self.prefix_cache:
+            for prefix in prefix_config.get("prefixes", []):
+                self.prefix_cache.register(prefix)
+            self.model_registry.on_evict(self.prefix_cache.invalidate)
+        # Batch schedulers are bound to the event loop their futures live on
+        self._batchers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, BatchScheduler]]" = weakref.WeakKeyDictionary()
         self.api_models = {}
+        self._load_failures: Dict[str, str] = {}
+        # Background loads for hot-replaced models, one at a time to bound peak memory
+        self._loader: Optional[ThreadPoolExecutor] = None
+        self._pending_loads: Dict[str, Future] = {}
+        self._config_lock = threading.RLock()
+        self._breakers: Dict[str, CircuitBreaker] = {}
         self._initialize_models()
 
     def _load_models_config(self) -> Dict[str, Any]:
@@ -39,7 +87,9 @@ class ModelManager:
                     "path": "gpt2",
                     "type": "causal",
                     "max_length": 1024,
-                    "device": "cpu"
+                    "device": "cpu",
+                    "quantization": "int8",
+                    "quantized_path": "config/models/quantized/gpt2"
                 }
             },
             "api_models": {
@@ -56,7 +106,40 @@ class ModelManager:
             },
             "fallback_strategy": {
                 "order": ["local", "api"],
-                "timeout": 30
+                "timeout": 30,
+                "hedge_after": None,
+                "circuit_breaker": {
+                    "failure_threshold": 3,
+                    "reset_timeout": 60
+                }
+            },
+            "model_registry": {
+                "memory_budget_mb": 8192
+            },
+            "batching": {
+                "enabled": True,
+                "max_batch_size": 8,
+                "window_ms": 20
+            },
+            "inference_pool": {
+                "workers": 2,
+                "torch_threads": None
+            },
+            "response_cache": {
+                "enabled": True,
+                "max_entries": 1024,
+                "ttl_seconds": 3600,
+                "disk_path": "config/cache/responses",
+                "max_disk_entries": 10000
+            },
+            "prefix_cache": {
+                "enabled": True,
+                "prefixes": []
+            },
+            "preload": {
+                "enabled": False,
+                "models": [],
+                "mmap_cache_dir": None
             }
         }
         
@@ -65,115 +148,808 @@ class ModelManager:
         return default_config
 
     def _initialize_models(self):
-        """Initialize configured models"""
-        # Initialize local models
-        for model_name, config in self.models_config["local_models"].items():
-            try:
-                model = AutoModelForCausalLM.from_pretrained(
-                    config["path"],
-                    device_map=config["device"]
-                )
-                tokenizer = AutoTokenizer.from_pretrained(config["path"])
-                self.local_models[model_name] = {
-                    "model": model,
-                    "tokenizer": tokenizer,
-                    "config": config
-                }
-            except Exception as e:
-                print(f"Failed to load local model {model_name}: {str(e)}")
-
+        """Initialize configured API clients; local models load on first use"""
         # Initialize API clients
         for model_name, config in self.models_config["api_models"].items():
-            if config["provider"] == "openai":
-                self.api_models[model_name] = {
-                    "client": openai,
-                    "config": config
-                }
+            self._initialize_api_model(model_name, config)
+
+    def _initialize_api_model(self, model_name: str, config: Dict[str, Any]):
+        """Build the client for a single API model"""
+        if config["provider"] == "openai":
+            self.api_models[model_name] = {
+                "client": openai,
+                "config": config
+            }
+
+    def _load_local_model(self, model_name: str, config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Load a local model and its tokenizer from the configured path"""
+        config = config or self.models_config["local_models"][model_name]
+        try:
+            model, tokenizer = self._load_weights(config)
+        except Exception as e:
+            self._load_failures[model_name] = str(e)
+            print(f"Failed to load local model {model_name}: {str(e)}")
+            raise
+
+        # Left padding keeps every prompt adjacent to its generated tokens in a batch
+        if tokenizer.pad_token is None:
+            tokenizer.pad_token = tokenizer.eos_token
+        tokenizer.padding_side = "left"
+
+        return {
+            "model": model,
+            "tokenizer": tokenizer,
+            "config": config
+        }
+
+    def _load_weights(self, config: Dict[str, Any]) -> Tuple[Any, Any]:
+        """Build the model and tokenizer for a local model config
+
+        Setting "quantization": "int8" loads the model with dynamically
+        quantized int8 linear layers for CPU inference; with
+        "quantized_path" the quantized weights are saved there on first
+        load and reloaded from it afterwards.
+
+        Float models on the cpu device are memory-mapped from the preload
+        "mmap_cache_dir" when it is set, so worker processes share them.
+        """
+        mmap_cache_dir = self.preload_config.get("mmap_cache_dir")
+        if config.get("quantization") == "int8":
+            if config["device"] != "cpu":
+                raise ValueError("int8 dynamic quantization only runs on the cpu device")
+            model = load_int8_model(config["path"], config.get("quantized_path"))
+        elif mmap_cache_dir and config["device"] == "cpu":
+            model = load_mmap_model(config["path"], Path(mmap_cache_dir))
+        else:
+            model = AutoModelForCausalLM.from_pretrained(
+                config["path"],
+                device_map=config["device"]
+            )
+        tokenizer = AutoTokenizer.from_pretrained(config["path"])
+        return model, tokenizer
+
+    def _get_local_model(self, model_name: str) -> Dict[str, Any]:
+        """Get a resident local model, loading it lazily into the registry"""
+        if model_name in self._load_failures:
+            raise RuntimeError(f"Local model {model_name} failed to load: {self._load_failures[model_name]}")
+        return self.model_registry.get(model_name, lambda: self._load_local_model(model_name))
+
+    def preload(self, names: Optional[List[str]] = None) -> Dict[str, bool]:
+        """Load local models now, typically in a master process before it forks workers
+
+        Forked workers inherit the weights and share their pages
+        copy-on-write for as long as nothing writes to them. gc.freeze()
+        then keeps the collector in each worker from touching, and so
+        copying, everything allocated up to this point. Defaults to the
+        preload "models" list, or every configured local model.
+        """
+        names = names or self.preload_config.get("models") or list(self.models_config["local_models"])
+        loaded = {}
+        for name in names:
+            try:
+                self._get_local_model(name)
+                loaded[name] = True
+            except Exception:
+                loaded[name] = False
+        gc.collect()
+        gc.freeze()
+        return loaded
+
+    def get_memory_stats(self) -> Dict[str, Any]:
+        """Shared and private memory of this process next to the resident model footprint"""
+        return {
+            **memory_usage(),
+            "model_resident_mb": round(self.model_registry.resident_bytes() / (1024 * 1024), 1)
+        }
+
+    def register_prompt_prefix(self, prefix: str):
+        """Register a shared prompt prefix whose prefill is reused across requests"""
+        if self.prefix_cache:
+            self.prefix_cache.register(prefix)
+
+    def get_registry_stats(self) -> Dict[str, Any]:
+        """Report resident local models, load times and memory footprint"""
+        return self.model_registry.stats()
 
     async def generate(self, prompt: str, model_preference: str = None) -> Dict[str, Any]:
-        """Generate response using available models"""
+        """Generate response using available models
+
+        Candidates are tried in fallback order, each under the configured
+        deadline. With `hedge_after` set, the next candidate also starts
+        once the current one has been running that long, and the first
+        successful answer wins. Backends whose circuit breaker is open are
+        skipped without being called.
+        """
+        strategy = self.models_config["fallback_strategy"]
+        timeout = strategy.get("timeout")
+        hedge_after = strategy.get("hedge_after")
+
+        remaining = self._candidate_models(model_preference)
+        running: Dict[asyncio.Future, str] = {}
+        try:
+            while remaining or running:
+                # Start the next admitted candidate when nothing is running (sequential fallback)
+                if not running:
+                    self._start_next(prompt, remaining, running, timeout)
+                    if not running:
+                        break
+
+                done, _ = await asyncio.wait(
+                    running.keys(),
+                    timeout=hedge_after if remaining else None,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    # The current attempt is slow; hedge with the next candidate
+                    self._start_next(prompt, remaining, running, timeout)
+                    continue
+
+                for attempt in done:
+                    running.pop(attempt)
+                    if attempt.exception() is None:
+                        return attempt.result()
+        finally:
+            for attempt, model_id in running.items():
+                attempt.cancel()
+                self._breaker(model_id).release()
+
+        raise Exception("No available models could generate a response")
+
+    async def generate_many(self, prompts: List[str], model_preference: str = None,
+                            max_concurrency: int = 8) -> List[Dict[str, Any]]:
+        """Generate responses for many prompts as one grouped call
+
+        Identical prompts are generated once. The rest run concurrently,
+        at most `max_concurrency` at a time, so prompts for a local model
+        reach its batch scheduler together and share padded generate
+        calls. A prompt that fails yields {"success": False, "error": ...}
+        at its position instead of failing the whole call.
+        """
+        semaphore = asyncio.Semaphore(max(1, int(max_concurrency)))
+
+        async def generate_one(prompt: str) -> Dict[str, Any]:
+            async with semaphore:
+                try:
+                    return await self.generate(prompt, model_preference)
+                except Exception as e:
+                    return {"success": False, "error": str(e)}
+
+        unique = list(dict.fromkeys(prompts))
+        results = dict(zip(unique, await asyncio.gather(*(generate_one(prompt) for prompt in unique))))
+        return [results[prompt] for prompt in prompts]
+
+    def _candidate_models(self, model_preference: Optional[str]) -> List[str]:
+        """Preferred model first, then every model in fallback order, as kind/name ids"""
+        candidates = []
         if model_preference:
-            # Try specific model first
-            if model_preference in self.local_models:
-                return await self._generate_local(prompt, model_preference)
-            elif model_preference in self.api_models:
-                return await self._generate_api(prompt, model_preference)
+            # Accept both "name" and "kind/name"; an unknown preference just falls through
+            kind, _, name = model_preference.rpartition("/")
+            if kind in ("", "local") and name in self.models_config["local_models"]:
+                candidates.append(f"local/{name}")
+            elif kind in ("", "api") and name in self.api_models:
+                candidates.append(f"api/{name}")
 
-        # Follow fallback strategy
         for model_type in self.models_config["fallback_strategy"]["order"]:
-            try:
-                if model_type == "local" and self.local_models:
-                    # Try first available local model
-                    model_name = next(iter(self.local_models))
-                    return await self._generate_local(prompt, model_name)
-                elif model_type == "api" and self.api_models:
-                    # Try first available API model
-                    model_name = next(iter(self.api_models))
-                    return await self._generate_api(prompt, model_name)
-            except Exception as e:
+            if model_type == "local":
+                names = self.models_config["local_models"]
+            elif model_type == "api":
+                names = self.api_models
+            else:
                 continue
+            candidates.extend(f"{model_type}/{name}" for name in names if f"{model_type}/{name}" not in candidates)
+        return candidates
 
-        raise Exception("No available models could generate a response")
+    def _start_next(self, prompt: str, remaining: List[str], running: Dict[asyncio.Future, str],
+                    timeout: Optional[float]):
+        """Start the next candidate whose circuit breaker admits a call"""
+        while remaining:
+            model_id = remaining.pop(0)
+            if self._breaker(model_id).allow():
+                running[asyncio.ensure_future(self._attempt(prompt, model_id, timeout))] = model_id
+                return
+
+    async def _attempt(self, prompt: str, model_id: str, timeout: Optional[float]) -> Dict[str, Any]:
+        """Run one backend under its deadline and report the outcome to its breaker"""
+        kind, model_name = model_id.split("/", 1)
+        generate = self._generate_local if kind == "local" else self._generate_api
+        breaker = self._breaker(model_id)
+        with GENERATE_SECONDS.time(model=model_id, cache="miss", outcome="failure") as span:
+            try:
+                # Looked up first so a cached answer never loads a cold model
+                cache_key = self._result_cache_key(model_id, prompt)
+                result = self._cached_result(cache_key, model_id)
+                if result is None:
+                    if kind == "local":
+                        # A cold load runs outside the deadline: timing it out would charge a healthy
+                        # model's breaker and leave the load running with the registry lock held
+                        await self._ensure_loaded(model_name)
+                    result = await asyncio.wait_for(generate(prompt, model_name, cache_key), timeout)
+            except asyncio.CancelledError:
+                # Lost a hedge race or the caller went away
+                span["outcome"] = "cancelled"
+                raise
+            except asyncio.TimeoutError:
+                span["outcome"] = "timeout"
+                breaker.record_failure()
+                raise
+            except Exception:
+                breaker.record_failure()
+                raise
+
+            if not result or not result.get("success"):
+                breaker.record_failure()
+                raise Exception(f"{model_id} returned no response")
+            span["outcome"] = "success"
+            span["cache"] = "hit" if result.get("cached") else "miss"
+        breaker.record_success()
+        return result
+
+    async def _ensure_loaded(self, model_name: str):
+        """Load a local model on the inference pool unless it is already resident"""
+        if model_name not in self.model_registry:
+            await self.inference_pool.run(self._get_local_model, model_name)
+
+    def _breaker(self, model_id: str) -> CircuitBreaker:
+        if model_id not in self._breakers:
+            breaker_config = self.models_config["fallback_strategy"].get("circuit_breaker", {})
+            self._breakers[model_id] = CircuitBreaker(
+                failure_threshold=breaker_config.get("failure_threshold", 3),
+                reset_timeout=breaker_config.get("reset_timeout", 60)
+            )
+        return self._breakers[model_id]
+
+    def get_breaker_stats(self) -> Dict[str, Any]:
+        """Report circuit breaker state per backend"""
+        return {model_id: breaker.stats() for model_id, breaker in self._breakers.items()}
+
+    async def generate_stream(self, prompt: str, model_preference: str = None) -> AsyncIterator[Dict[str, Any]]:
+        """Yield {"token": ...} events as text is decoded, then a final {"done": True, ...} event
+
+        The stream runs under the same guard as a generate() attempt: the
+        model's circuit breaker must admit it, a cold model is loaded
+        before the deadline starts, and the outcome is reported to the
+        breaker. Until the first token is sent, any failure falls back to
+        generate() and the answer arrives as one chunk.
+        """
+        model_name = self._resolve_stream_model(model_preference)
+        if model_name is None:
+            # API models and fallbacks are not incremental
+            async for event in self._generate_as_stream(prompt, model_preference):
+                yield event
+            return
+
+        model_id = f"local/{model_name}"
+        started = time.perf_counter()
+        cache_key = self._result_cache_key(model_id, prompt)
+        cached = self._cached_result(cache_key, model_id)
+        if cached:
+            GENERATE_SECONDS.observe(time.perf_counter() - started, model=model_id, cache="hit", outcome="success")
+            yield {"token": self._completion(prompt, cached["response"])}
+            yield {"done": True, **cached}
+            return
+
+        breaker = self._breaker(model_id)
+        if not breaker.allow():
+            async for event in self._generate_as_stream(prompt, model_preference):
+                yield event
+            return
+
+        try:
+            await self._ensure_loaded(model_name)
+        except asyncio.CancelledError:
+            breaker.release()
+            raise
+        except Exception:
+            breaker.record_failure()
+            async for event in self._generate_as_stream(prompt, model_preference):
+                yield event
+            return
+
+        loop = asyncio.get_running_loop()
+        timeout = self.models_config["fallback_strategy"].get("timeout")
+        deadline = loop.time() + timeout if timeout else None
+        queue: asyncio.Queue = asyncio.Queue()
+        finished = object()
+        cancelled = threading.Event()
+
+        def on_text(text: str):
+            loop.call_soon_threadsafe(queue.put_nowait, text)
+
+        generation = asyncio.ensure_future(
+            self.inference_pool.run(self._generate_local_stream, model_name, prompt, on_text, cancelled)
+        )
+        generation.add_done_callback(lambda _: queue.put_nowait(finished))
+
+        emitted = False
+        reported = False
+        failure = None
+        try:
+            with GENERATE_SECONDS.time(model=model_id, cache="miss", outcome="cancelled") as span:
+                try:
+                    while True:
+                        remaining = deadline - loop.time() if deadline is not None else None
+                        text = await asyncio.wait_for(queue.get(), remaining)
+                        if text is finished:
+                            break
+                        emitted = True
+                        yield {"token": text}
+                    response = await generation
+                    span["outcome"] = "success"
+                except asyncio.TimeoutError:
+                    span["outcome"] = "timeout"
+                    failure = Exception(f"{model_id} timed out after {timeout}s")
+                except Exception as e:
+                    span["outcome"] = "failure"
+                    failure = e
+
+                reported = True
+                if failure is None:
+                    breaker.record_success()
+                else:
+                    breaker.record_failure()
+        finally:
+            # Stop decoding on a timeout or if the consumer disconnected mid-stream
+            cancelled.set()
+            if not reported:
+                breaker.release()
+
+        if failure is not None:
+            if emitted:
+                raise failure
+            # Nothing reached the client yet, so the regular fallback chain can still answer
+            async for event in self._generate_as_stream(prompt, model_preference):
+                yield event
+            return
+
+        result = {
+            "success": True,
+            "response": response,
+            "model": model_id
+        }
+        self._store_result(cache_key, result)
+        yield {"done": True, **result}
+
+    async def _generate_as_stream(self, prompt: str, model_preference: Optional[str]) -> AsyncIterator[Dict[str, Any]]:
+        """generate() shaped as a stream: the whole answer as one chunk, then the done event"""
+        result = await self.generate(prompt, model_preference)
+        yield {"token": self._completion(prompt, result["response"])}
+        yield {"done": True, **result}
+
+    @staticmethod
+    def _completion(prompt: str, response: str) -> str:
+        """The text after the prompt, as live streams emit it; local models echo the prompt, API models do not"""
+        return response[len(prompt):] if response.startswith(prompt) else response
+
+    def _resolve_stream_model(self, model_preference: Optional[str]) -> Optional[str]:
+        """The local model generate() would try first for this preference, or None to fall back"""
+        candidates = self._candidate_models(model_preference)
+        if candidates and candidates[0].startswith("local/"):
+            return candidates[0].split("/", 1)[1]
+        return None
 
-    async def _generate_local(self, prompt: str, model_name: str) -> Dict[str, Any]:
-        """Generate response using local model"""
-        model_data = self.local_models[model_name]
+    async def _generate_local(self, prompt: str, model_name: str, cache_key: Optional[str] = None) -> Dict[str, Any]:
+        """Generate response using local model, storing it under `cache_key`"""
+        if self.batching_config.get("enabled", True):
+            response = await self._get_batcher(model_name).submit(prompt)
+        else:
+            responses = await self.inference_pool.run(self._generate_batch, model_name, [prompt])
+            response = responses[0]
+
+        result = {
+            "success": True,
+            "response": response,
+            "model": f"local/{model_name}"
+        }
+        self._store_result(cache_key, result)
+        return result
+
+    def _generation_params(self, model_name: str) -> Dict[str, Any]:
+        """Everything besides the prompt that determines a local model's output"""
+        return {**self.models_config["local_models"][model_name], "temperature": 0.7}
+
+    def _result_cache_key(self, model_id: str, prompt: str) -> Optional[str]:
+        kind, model_name = model_id.split("/", 1)
+        if kind == "local":
+            return self._cache_key(model_id, prompt, self._generation_params(model_name))
+        return self._cache_key(model_id, prompt, self.api_models[model_name]["config"])
+
+    def _cache_key(self, model_id: str, prompt: str, params: Dict[str, Any]) -> Optional[str]:
+        if self.response_cache is None:
+            return None
+        return ResponseCache.make_key(model_id, prompt, params)
+
+    def _cached_result(self, cache_key: Optional[str], model_id: str) -> Optional[Dict[str, Any]]:
+        """Return a cached generation result, or None on a miss"""
+        if cache_key is None:
+            return None
+        response = self.response_cache.get(cache_key)
+        if response is None:
+            return None
+        return {
+            "success": True,
+            "response": response,
+            "model": model_id,
+            "cached": True
+        }
+
+    def _store_result(self, cache_key: Optional[str], result: Dict[str, Any]):
+        if cache_key is None or not result.get("success"):
+            return
+        try:
+            self.response_cache.set(cache_key, result["response"])
+        except Exception as e:
+            # The answer is already generated; failing to cache it must not fail the request or its breaker
+            print(f"Failed to cache response: {str(e)}")
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Report response cache hit/miss counters and tier sizes"""
+        return self.response_cache.stats() if self.response_cache else {"enabled": False}
+
+    def get_prefix_cache_stats(self) -> Dict[str, Any]:
+        """Report registered prefixes and prefill reuse per model"""
+        return self.prefix_cache.stats() if self.prefix_cache else {"enabled": False}
+
+    def _generate_batch(self, model_name: str, prompts: List[str]) -> List[str]:
+        """Generate a batch, resuming prompts that share a registered prefix from its prefill
+
+        Prompts are grouped by the prefix they start with; each group is
+        one generate call, and so are the prompts without a prefix.
+        """
+        groups: Dict[Optional[str], List[int]] = {}
+        for position, prompt in enumerate(prompts):
+            prefix = self.prefix_cache.match(prompt) if self.prefix_cache else None
+            groups.setdefault(prefix, []).append(position)
+
+        responses: List[Optional[str]] = [None] * len(prompts)
+        for prefix, positions in groups.items():
+            group = [prompts[position] for position in positions]
+            if prefix:
+                outputs = self._generate_prefix_batch(model_name, prefix, group)
+            else:
+                outputs = self._generate_local_batch(model_name, group)
+            for position, output in zip(positions, outputs):
+                responses[position] = output
+        return responses
+
+    def _generate_local_batch(self, model_name: str, prompts: List[str]) -> List[str]:
+        """Run one padded generate call for a batch of prompts"""
+        model_data = self._get_local_model(model_name)
         model = model_data["model"]
         tokenizer = model_data["tokenizer"]
         config = model_data["config"]
 
-        inputs = tokenizer(prompt, return_tensors="pt").to(config["device"])
+        inputs = tokenizer(prompts, return_tensors="pt", padding=True).to(config["device"])
+        # max_length would count each row's left padding, so a short prompt batched with a
+        # long one would get fewer new tokens than alone. Decode up to the largest per-row
+        # budget instead and cut every row back to max_length of its own tokens.
+        lengths = inputs["attention_mask"].sum(dim=1).tolist()
+        width = inputs["input_ids"].shape[1]
+        max_length = config["max_length"]
         outputs = model.generate(
             **inputs,
-            max_length=config["max_length"],
+            max_new_tokens=max(1, max_length - min(lengths)),
             num_return_sequences=1,
-            temperature=0.7
+            temperature=0.7,
+            pad_token_id=tokenizer.pad_token_id
         )
-        
-        response = tokenizer.decode(outputs[0], skip_special_tokens=True)
+        sequences = [
+            outputs[row, width - length:width + max(0, max_length - length)]
+            for row, length in enumerate(lengths)
+        ]
+
+        TOKENS.inc(sum(lengths), model=f"local/{model_name}", kind="prompt")
+        for sequence, length in zip(sequences, lengths):
+            generated = sequence[length:]
+            if tokenizer.pad_token_id is not None:
+                generated = generated[generated != tokenizer.pad_token_id]
+            TOKENS.inc(generated.numel(), model=f"local/{model_name}", kind="completion")
+        return tokenizer.batch_decode(sequences, skip_special_tokens=True)
+
+    def _generate_prefix_batch(self, model_name: str, prefix: str, prompts: List[str]) -> List[str]:
+        """Generate prompts that start with `prefix` as one batch resumed from its cached prefill
+
+        The prefill is expanded along the batch dimension and only the
+        suffixes are padded. Padding therefore sits between the prefix and
+        each suffix. The attention mask hides it, and position ids are
+        derived from the mask, so every row decodes as it would alone.
+        """
+        model_data = self._get_local_model(model_name)
+        model = model_data["model"]
+        tokenizer = model_data["tokenizer"]
+        config = model_data["config"]
+        device = config["device"]
+
+        entry = self.prefix_cache.get(
+            model_name, prefix,
+            lambda: self._prefill_prefix(model, tokenizer, prefix, device)
+        )
+        prefix_ids = entry["input_ids"][0]
+        prefix_length = prefix_ids.shape[0]
+
+        encoded = [tokenizer(prompt, return_tensors="pt").to(device)["input_ids"][0] for prompt in prompts]
+        aligned = [
+            position for position, ids in enumerate(encoded)
+            if ids.shape[0] >= prefix_length and torch.equal(ids[:prefix_length], prefix_ids)
+        ]
+        responses: List[Optional[str]] = [None] * len(prompts)
+        misaligned = [position for position in range(len(prompts)) if position not in set(aligned)]
+        if misaligned:
+            # The suffix merged into the prefix's last token, so the prefill does not line up
+            outputs = self._generate_local_batch(model_name, [prompts[position] for position in misaligned])
+            for position, output in zip(misaligned, outputs):
+                responses[position] = output
+        if not aligned:
+            return responses
+
+        # Each suffix starts at the last prefix token, which the cached prefill leaves out
+        suffixes = [encoded[position][prefix_length - 1:] for position in aligned]
+        width = max(suffix.shape[0] for suffix in suffixes)
+        rows = len(suffixes)
+        pad_token_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else tokenizer.eos_token_id
+        suffix_ids = torch.full((rows, width), pad_token_id, dtype=prefix_ids.dtype, device=device)
+        suffix_mask = torch.zeros((rows, width), dtype=torch.long, device=device)
+        for row, suffix in enumerate(suffixes):
+            suffix_ids[row, width - suffix.shape[0]:] = suffix
+            suffix_mask[row, width - suffix.shape[0]:] = 1
+
+        cached = prefix_length - 1
+        input_ids = torch.cat([prefix_ids[:cached].expand(rows, cached), suffix_ids], dim=1)
+        attention_mask = torch.cat([torch.ones((rows, cached), dtype=torch.long, device=device), suffix_mask], dim=1)
+        position_ids = (attention_mask.cumsum(dim=1) - 1).clamp(min=0)
+
+        past_key_values = self._expand_past(self._reusable_past(entry["past_key_values"]), rows)
+        with torch.no_grad():
+            # The cache covers all but the last prefix token; extend it to all but the last suffix token
+            if width > 1:
+                past_key_values = model(
+                    input_ids[:, cached:-1],
+                    attention_mask=attention_mask[:, :-1],
+                    position_ids=position_ids[:, cached:-1],
+                    past_key_values=past_key_values,
+                    use_cache=True
+                ).past_key_values
+
+        # As in _generate_local_batch, every row is cut back to max_length of its own tokens
+        lengths = [cached + suffix.shape[0] for suffix in suffixes]
+        total = input_ids.shape[1]
+        max_length = config["max_length"]
+        outputs = model.generate(
+            input_ids=input_ids,
+            attention_mask=attention_mask,
+            past_key_values=past_key_values,
+            max_new_tokens=max(1, max_length - min(lengths)),
+            num_return_sequences=1,
+            temperature=0.7,
+            pad_token_id=tokenizer.pad_token_id
+        )
+        sequences = [
+            torch.cat([outputs[row, :cached], outputs[row, total - suffix.shape[0]:total + max(0, max_length - length)]])
+            for row, (suffix, length) in enumerate(zip(suffixes, lengths))
+        ]
+
+        TOKENS.inc(sum(lengths), model=f"local/{model_name}", kind="prompt")
+        for sequence, length in zip(sequences, lengths):
+            generated = sequence[length:]
+            if tokenizer.pad_token_id is not None:
+                generated = generated[generated != tokenizer.pad_token_id]
+            TOKENS.inc(generated.numel(), model=f"local/{model_name}", kind="completion")
+        for position, output in zip(aligned, tokenizer.batch_decode(sequences, skip_special_tokens=True)):
+            responses[position] = output
+        return responses
+
+    def _prefill_prefix(self, model, tokenizer, prefix: str, device: str) -> Dict[str, Any]:
+        """Encode a prefix once and keep the attention cache for its leading tokens"""
+        input_ids = tokenizer(prefix, return_tensors="pt").to(device)["input_ids"]
+        past_key_values = None
+        if input_ids.shape[1] > 1:
+            with torch.no_grad():
+                past_key_values = model(input_ids[:, :-1], use_cache=True).past_key_values
         return {
-            "success": True,
-            "response": response,
-            "model": f"local/{model_name}"
+            "input_ids": input_ids,
+            "past_key_values": past_key_values
         }
 
-    async def _generate_api(self, prompt: str, model_name: str) -> Dict[str, Any]:
-        """Generate response using API model"""
+    @staticmethod
+    def _expand_past(past_key_values: Any, rows: int) -> Any:
+        """Repeat a single-row attention cache `rows` times along the batch dimension"""
+        if past_key_values is None or rows == 1:
+            return past_key_values
+        if isinstance(past_key_values, tuple):
+            return tuple(
+                tuple(tensor.expand(rows, *tensor.shape[1:]).contiguous() for tensor in layer)
+                for layer in past_key_values
+            )
+        past_key_values.batch_repeat_interleave(rows)
+        return past_key_values
+
+    @staticmethod
+    def _reusable_past(past_key_values: Any) -> Any:
+        """Legacy tuple caches are never written in place; cache objects are, so copy those"""
+        if past_key_values is None or isinstance(past_key_values, tuple):
+            return past_key_values
+        return copy.deepcopy(past_key_values)
+
+    def _generate_local_stream(self, model_name: str, prompt: str,
+                               on_text: Callable[[str], None], cancelled: threading.Event) -> str:
+        """Generate a single sequence, pushing decoded text to `on_text` as it is produced"""
+        model_data = self._get_local_model(model_name)
+        model = model_data["model"]
+        tokenizer = model_data["tokenizer"]
+        config = model_data["config"]
+
+        inputs = tokenizer(prompt, return_tensors="pt").to(config["device"])
+        outputs = model.generate(
+            **inputs,
+            max_length=config["max_length"],
+            num_return_sequences=1,
+            temperature=0.7,
+            pad_token_id=tokenizer.pad_token_id,
+            streamer=CallbackTextStreamer(tokenizer, on_text, skip_special_tokens=True),
+            stopping_criteria=StoppingCriteriaList([CancelCriteria(cancelled)])
+        )
+
+        TOKENS.inc(inputs["input_ids"].shape[1], model=f"local/{model_name}", kind="prompt")
+        TOKENS.inc(outputs.shape[1] - inputs["input_ids"].shape[1], model=f"local/{model_name}", kind="completion")
+        return tokenizer.decode(outputs[0], skip_special_tokens=True)
+
+    def _get_batcher(self, model_name: str) -> BatchScheduler:
+        """Get the batch scheduler for a model on the running event loop"""
+        loop = asyncio.get_running_loop()
+        batchers = self._batchers.setdefault(loop, {})
+        if model_name not in batchers:
+            async def run_batch(prompts: List[str]) -> List[str]:
+                return await self.inference_pool.run(self._generate_batch, model_name, prompts)
+
+            batchers[model_name] = BatchScheduler(
+                run_batch,
+                max_batch_size=self.batching_config.get("max_batch_size", 8),
+                window_ms=self.batching_config.get("window_ms", 20)
+            )
+        return batchers[model_name]
+
+    def get_batching_stats(self) -> Dict[str, Any]:
+        """Report batch counts and average batch size per local model"""
+        stats = {}
+        for batchers in list(self._batchers.values()):
+            for model_name, batcher in batchers.items():
+                model_stats = stats.setdefault(model_name, {"batches": 0, "requests": 0, "pending": 0})
+                batcher_stats = batcher.stats()
+                for key in model_stats:
+                    model_stats[key] += batcher_stats[key]
+        for model_stats in stats.values():
+            model_stats["avg_batch_size"] = round(model_stats["requests"] / model_stats["batches"], 2) if model_stats["batches"] else 0.0
+        return stats
+
+    async def _generate_api(self, prompt: str, model_name: str, cache_key: Optional[str] = None) -> Dict[str, Any]:
+        """Generate response using API model, storing it under `cache_key`"""
         model_data = self.api_models[model_name]
         client = model_data["client"]
         config = model_data["config"]
 
         if config["provider"] == "openai":
-            response = client.ChatCompletion.create(
+            # Network-bound, so keep it off both the event loop and the inference pool
+            loop = asyncio.get_running_loop()
+            response = await loop.run_in_executor(None, lambda: client.ChatCompletion.create(
                 model=config["model_id"],
                 messages=[{"role": "user", "content": prompt}]
-            )
-            return {
+            ))
+            usage = getattr(response, "usage", None)
+            if usage is not None:
+                TOKENS.inc(usage.get("prompt_tokens", 0), model=f"api/{model_name}", kind="prompt")
+                TOKENS.inc(usage.get("completion_tokens", 0), model=f"api/{model_name}", kind="completion")
+            result = {
                 "success": True,
                 "response": response.choices[0].message.content,
                 "model": f"api/{model_name}"
             }
+            self._store_result(cache_key, result)
+            return result
+
+    def add_local_model(self, name: str, config: Dict[str, Any], wait: bool = False) -> bool:
+        """Add or replace a single local model without touching the others
 
-    def add_local_model(self, name: str, config: Dict[str, Any]) -> bool:
-        """Add a new local model configuration"""
+        A new model is loaded lazily on first use. When `name` is already
+        resident, the replacement loads in the background and is swapped in
+        atomically; requests already running keep the old instance. A later
+        replacement or a removal supersedes a load still in progress.
+        """
         try:
-            self.models_config["local_models"][name] = config
-            self._initialize_models()
-            self._save_config()
+            with self._config_lock:
+                if name not in self.model_registry:
+                    self.models_config["local_models"][name] = config
+                    self._load_failures.pop(name, None)
+                    self._save_config()
+                    return True
+
+                if self._loader is None:
+                    self._loader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-loader")
+                # Identifies this load: it publishes only while it is still the pending one
+                future: Future = Future()
+                self._pending_loads[name] = future
+                self._loader.submit(self._swap_local_model, name, config, future)
+
+            if wait:
+                return future.result()
             return True
         except Exception:
             return False
 
+    def _swap_local_model(self, name: str, config: Dict[str, Any], future: Future) -> bool:
+        """Load replacement weights, then publish config and model together unless superseded"""
+        published = False
+        try:
+            start = time.perf_counter()
+            model_data = self._load_local_model(name, config)
+            load_time = time.perf_counter() - start
+        except Exception:
+            # The old instance keeps serving when the replacement cannot load
+            self._load_failures.pop(name, None)
+            model_data = None
+
+        try:
+            with self._config_lock:
+                current = self._pending_loads.get(name) is future
+                if current:
+                    del self._pending_loads[name]
+                # Removed, or replaced again, while loading: drop these weights
+                if model_data is not None and current and name in self.models_config["local_models"]:
+                    self.models_config["local_models"][name] = config
+                    if self.prefix_cache:
+                        self.prefix_cache.invalidate(name)
+                    self.model_registry.put(name, model_data, load_time)
+                    self._load_failures.pop(name, None)
+                    self._save_config()
+                    published = True
+        finally:
+            future.set_result(published)
+        return published
+
+    def remove_local_model(self, name: str) -> bool:
+        """Remove a local model and release its weights once in-flight requests finish"""
+        with self._config_lock:
+            if name not in self.models_config["local_models"]:
+                return False
+            del self.models_config["local_models"][name]
+            # A replacement still loading finds itself superseded and is discarded
+            self._pending_loads.pop(name, None)
+            self.model_registry.evict(name)
+            self._load_failures.pop(name, None)
+            self._save_config()
+        return True
+
     def add_api_model(self, name: str, config: Dict[str, Any]) -> bool:
         """Add a new API model configuration"""
         try:
-            self.models_config["api_models"][name] = config
-            self._initialize_models()
-            self._save_config()
+            with self._config_lock:
+                self.models_config["api_models"][name] = config
+                self._initialize_api_model(name, config)
+                self._save_config()
             return True
         except Exception:
             return False
 
+    def remove_api_model(self, name: str) -> bool:
+        """Remove an API model and its client"""
+        with self._config_lock:
+            if self.models_config["api_models"].pop(name, None) is None:
+                return False
+            self.api_models.pop(name, None)
+            self._save_config()
+        return True
+
+    def get_pending_loads(self) -> List[str]:
+        """Names of models whose replacement weights are still loading"""
+        with self._config_lock:
+            return list(self._pending_loads.keys())
+
+    def shutdown(self, wait: bool = True):
+        """Stop the model loader and inference threads"""
+        with self._config_lock:
+            loader, self._loader = self._loader, None
+        if loader is not None:
+            loader.shutdown(wait=wait)
+        self.inference_pool.shutdown(wait=wait)
+
     def _save_config(self):
         """Save current configuration to file"""
         with open(self.config_path / "models_config.json", 'w') as f:
@@ -0,0 +1,146 @@
+from typing import Dict, Any, Optional, Callable, List
+from collections import OrderedDict
+import threading
+import time
+
+class ModelRegistry:
+    """LRU registry of resident local models bounded by a memory budget"""
+
+    def __init__(self, memory_budget_mb: Optional[float] = None):
+        self.memory_budget_bytes = int(memory_budget_mb * 1024 * 1024) if memory_budget_mb else None
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._known_footprints: Dict[str, int] = {}
+        self._evict_callbacks: List[Callable[[str], None]] = []
+        self.evictions = 0
+
+    def get(self, name: str, loader: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """Return resident model data, loading it with `loader` on first use"""
+        model_data = self._touch(name)
+        if model_data is not None:
+            return model_data
+
+        with self._lock:
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+
+        # Only one thread loads a given model; the others wait and reuse it
+        with load_lock:
+            model_data = self._touch(name)
+            if model_data is not None:
+                return model_data
+
+            # Make room up front when we already know how big this model is
+            known_footprint = self._known_footprints.get(name)
+            if known_footprint:
+                self._evict_for(known_footprint, keep=name)
+
+            start = time.perf_counter()
+            model_data = loader()
+            load_time = time.perf_counter() - start
+            self.put(name, model_data, load_time)
+            return model_data
+
+    def put(self, name: str, model_data: Dict[str, Any], load_time: float = 0.0):
+        """Insert or replace a resident model, evicting LRU models over budget"""
+        footprint = estimate_footprint(model_data.get("model"))
+        with self._lock:
+            self._entries.pop(name, None)
+            self._evict_for(footprint, keep=name)
+            self._entries[name] = {
+                "model_data": model_data,
+                "load_time": load_time,
+                "footprint": footprint,
+                "loaded_at": time.time(),
+                "last_used": time.time(),
+                "hits": 0
+            }
+            self._known_footprints[name] = footprint
+
+    def evict(self, name: str) -> bool:
+        """Drop a resident model; in-flight users keep their own reference"""
+        with self._lock:
+            entry = self._entries.pop(name, None)
+        if entry is None:
+            return False
+        self.evictions += 1
+        for callback in self._evict_callbacks:
+            callback(name)
+        return True
+
+    def on_evict(self, callback: Callable[[str], None]):
+        """Register a callback invoked with the model name after eviction"""
+        self._evict_callbacks.append(callback)
+
+    def stats(self) -> Dict[str, Any]:
+        """Report resident models with their load time and memory footprint"""
+        with self._lock:
+            models = {
+                name: {
+                    "load_time_seconds": round(entry["load_time"], 3),
+                    "footprint_mb": round(entry["footprint"] / (1024 * 1024), 1),
+                    "loaded_at": entry["loaded_at"],
+                    "last_used": entry["last_used"],
+                    "hits": entry["hits"]
+                }
+                for name, entry in self._entries.items()
+            }
+            return {
+                "models": models,
+                "resident_mb": round(self.resident_bytes() / (1024 * 1024), 1),
+                "budget_mb": round(self.memory_budget_bytes / (1024 * 1024), 1) if self.memory_budget_bytes else None,
+                "evictions": self.evictions
+            }
+
+    def resident_bytes(self) -> int:
+        with self._lock:
+            return sum(entry["footprint"] for entry in self._entries.values())
+
+    def names(self) -> List[str]:
+        with self._lock:
+            return list(self._entries.keys())
+
+    def __contains__(self, name: str) -> bool:
+        with self._lock:
+            return name in self._entries
+
+    def _touch(self, name: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                return None
+            self._entries.move_to_end(name)
+            entry["last_used"] = time.time()
+            entry["hits"] += 1
+            return entry["model_data"]
+
+    def _evict_for(self, footprint: int, keep: str):
+        """Evict least-recently-used models until `footprint` more bytes fit"""
+        if not self.memory_budget_bytes:
+            return
+        with self._lock:
+            candidates = [name for name in self._entries if name != keep]
+        for name in candidates:
+            if self.resident_bytes() + footprint <= self.memory_budget_bytes:
+                break
+            self.evict(name)
+
+def estimate_footprint(model: Any) -> int:
+    """Estimate the resident size of a model's parameters and buffers in bytes"""
+    if model is None:
+        return 0
+    if getattr(model, "quantization_mode", None):
+        from .quantization import state_dict_bytes
+        return state_dict_bytes(model)
+    if hasattr(model, "get_memory_footprint"):
+        try:
+            return int(model.get_memory_footprint())
+        except Exception:
+            pass
+    total = 0
+    for tensors in (getattr(model, "parameters", None), getattr(model, "buffers", None)):
+        if tensors is None:
+            continue
+        for tensor in tensors():
+            total += tensor.nelement() * tensor.element_size()
+    return total
\ No newline at end of file
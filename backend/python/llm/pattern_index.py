@@ -0,0 +1,76 @@
+from typing import Dict, Any, List, Set, Tuple
+from collections import defaultdict
+import hashlib
+import heapq
+import json
+
+class PatternIndex:
+    """Inverted index from context keys and key=value pairs to pattern ids
+
+    Scoring matches `len(common keys) / max(len(pattern), len(context))`
+    plus one point per key whose value is equal, but only patterns sharing
+    at least one key with the context are ever looked at.
+    """
+
+    def __init__(self):
+        self._by_key: Dict[str, Set[str]] = defaultdict(set)
+        self._by_pair: Dict[Tuple[str, str], Set[str]] = defaultdict(set)
+        self._pairs: Dict[str, List[Tuple[str, str]]] = {}
+        self._order: Dict[str, int] = {}
+        self._sequence = 0
+
+    def __len__(self) -> int:
+        return len(self._pairs)
+
+    def add(self, pattern_id: str, pattern: Dict[str, Any]):
+        if pattern_id in self._pairs:
+            self.remove(pattern_id)
+        pairs = [(key, canonical_value(value)) for key, value in pattern.items()]
+        for key, value in pairs:
+            self._by_key[key].add(pattern_id)
+            self._by_pair[(key, value)].add(pattern_id)
+        self._pairs[pattern_id] = pairs
+        self._order[pattern_id] = self._sequence
+        self._sequence += 1
+
+    def remove(self, pattern_id: str):
+        for key, value in self._pairs.pop(pattern_id, []):
+            self._discard(self._by_key, key, pattern_id)
+            self._discard(self._by_pair, (key, value), pattern_id)
+        self._order.pop(pattern_id, None)
+
+    def top_k(self, context: Dict[str, Any], k: int = 5) -> List[Tuple[float, str]]:
+        """Return up to k (score, pattern_id) pairs, best first, ties oldest first"""
+        if not context:
+            return []
+        common: Dict[str, int] = defaultdict(int)
+        matches: Dict[str, int] = defaultdict(int)
+        for key, value in context.items():
+            for pattern_id in self._by_key.get(key, ()):
+                common[pattern_id] += 1
+            for pattern_id in self._by_pair.get((key, canonical_value(value)), ()):
+                matches[pattern_id] += 1
+
+        context_size = len(context)
+        scored = (
+            (shared / max(len(self._pairs[pattern_id]), context_size) + matches.get(pattern_id, 0), pattern_id)
+            for pattern_id, shared in common.items()
+        )
+        best = heapq.nlargest(k, scored, key=lambda item: (item[0], -self._order[item[1]]))
+        return best
+
+    @staticmethod
+    def _discard(index: Dict[Any, Set[str]], key: Any, pattern_id: str):
+        ids = index.get(key)
+        if ids is not None:
+            ids.discard(pattern_id)
+            if not ids:
+                del index[key]
+
+def canonical_value(value: Any) -> str:
+    """Stable, hashable form of a context value for equality lookups"""
+    return json.dumps(value, sort_keys=True, default=str)
+
+def pattern_hash(pattern: Dict[str, Any]) -> str:
+    """Content id of a pattern: identical contexts always map to the same id"""
+    return hashlib.sha256(canonical_value(pattern).encode("utf-8")).hexdigest()
\ No newline at end of file
@@ -0,0 +1,98 @@
+from typing import Dict, Any, List, Optional
+from array import array
+
+class PatternMetrics:
+    """Outcome counters and rolling latency statistics for one learned pattern
+
+    Latency keeps an exponentially weighted moving average plus the last
+    `window_size` samples in a fixed-size float array used as a ring
+    buffer, so percentiles cover recent executions only and the memory
+    per pattern is bounded.
+    """
+
+    __slots__ = ("hits", "successes", "last_seen", "latency_ewma", "_window", "_next", "_count")
+
+    def __init__(self, hits: int = 0, successes: int = 0, last_seen: float = 0.0,
+                 latency_ewma: Optional[float] = None, window_size: int = 32):
+        self.hits = hits
+        self.successes = successes
+        self.last_seen = last_seen
+        self.latency_ewma = latency_ewma
+        self._window = array("f", bytes(4 * window_size))
+        self._next = 0
+        self._count = 0
+
+    @property
+    def failures(self) -> int:
+        return self.hits - self.successes
+
+    @property
+    def success_rate(self) -> float:
+        """Success rate smoothed towards 0.5 so one early outcome does not dominate"""
+        return (self.successes + 1) / (self.hits + 2)
+
+    def record(self, success: bool, latency: Optional[float] = None, now: float = 0.0, alpha: float = 0.2):
+        self.hits += 1
+        self.successes += int(success)
+        self.last_seen = now
+        if latency is not None:
+            self.add_latency(latency, alpha)
+
+    def add_latency(self, latency: float, alpha: float = 0.2):
+        if self.latency_ewma is None:
+            self.latency_ewma = latency
+        else:
+            self.latency_ewma += alpha * (latency - self.latency_ewma)
+        if len(self._window):
+            self._window[self._next] = latency
+            self._next = (self._next + 1) % len(self._window)
+            self._count = min(self._count + 1, len(self._window))
+
+    def samples(self) -> List[float]:
+        """Windowed latency samples, oldest first"""
+        if self._count < len(self._window):
+            return self._window[:self._count].tolist()
+        return (self._window[self._next:] + self._window[:self._next]).tolist()
+
+    def latency_percentile(self, q: float) -> Optional[float]:
+        """Nearest-rank percentile (0-100) of the windowed latencies"""
+        if not self._count:
+            return None
+        ordered = sorted(self._window[:self._count])
+        rank = max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered) + 0.5)) - 1))
+        return ordered[rank]
+
+    def to_row(self) -> Dict[str, Any]:
+        """Snapshot in the pattern store's column layout"""
+        return {
+            "hits": self.hits,
+            "successes": self.successes,
+            "last_seen": self.last_seen,
+            "latency_ewma": self.latency_ewma,
+            "latency_window": array("f", self.samples()).tobytes()
+        }
+
+    @classmethod
+    def from_row(cls, row: Dict[str, Any], window_size: int = 32) -> "PatternMetrics":
+        metrics = cls(row["hits"], row["successes"], row["last_seen"], row.get("latency_ewma"), window_size)
+        if row.get("latency_window") and window_size:
+            samples = array("f")
+            samples.frombytes(row["latency_window"])
+            for latency in samples[-window_size:]:
+                metrics._window[metrics._next] = latency
+                metrics._next = (metrics._next + 1) % window_size
+                metrics._count = min(metrics._count + 1, window_size)
+        return metrics
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "successes": self.successes,
+            "failures": self.failures,
+            "success_rate": self.success_rate,
+            "last_seen": self.last_seen,
+            "latency_ewma": self.latency_ewma,
+            "latency_p50": self.latency_percentile(50),
+            "latency_p95": self.latency_percentile(95),
+            "latency_samples": self._count
+        }
\ No newline at end of file
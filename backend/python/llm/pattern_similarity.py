@@ -0,0 +1,89 @@
+from typing import Dict, Any, List, Tuple
+import zlib
+from .pattern_index import canonical_value
+
+try:
+    import numpy as np
+except ImportError:  # similarity search is optional; exact index lookups still work
+    np = None
+
+class PatternSimilarityIndex:
+    """Dense feature vectors for approximate pattern matching
+
+    Each context is hashed into a fixed-size bag of `key` and `key=value`
+    features, L2-normalised and stored as one row of a contiguous float32
+    matrix. A top-k query is a single matrix-vector product, so contexts
+    that share most but not all values still rank highly.
+    """
+
+    KEY_WEIGHT = 0.5
+    PAIR_WEIGHT = 1.0
+
+    def __init__(self, dim: int = 128, initial_capacity: int = 1024):
+        if np is None:
+            raise RuntimeError("numpy is required for pattern similarity search")
+        self.dim = dim
+        self._matrix = np.zeros((initial_capacity, dim), dtype=np.float32)
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def encode(self, context: Dict[str, Any]) -> "np.ndarray":
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for key, value in context.items():
+            self._add_feature(vector, f"k:{key}", self.KEY_WEIGHT)
+            self._add_feature(vector, f"kv:{key}={canonical_value(value)}", self.PAIR_WEIGHT)
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector /= norm
+        return vector
+
+    def add(self, pattern_id: str, pattern: Dict[str, Any]):
+        row = self._rows.get(pattern_id)
+        if row is None:
+            row = len(self._ids)
+            if row == self._matrix.shape[0]:
+                grown = np.zeros((row * 2, self.dim), dtype=np.float32)
+                grown[:row] = self._matrix
+                self._matrix = grown
+            self._ids.append(pattern_id)
+            self._rows[pattern_id] = row
+        self._matrix[row] = self.encode(pattern)
+
+    def remove(self, pattern_id: str):
+        """Drop a row by moving the last row into its place"""
+        row = self._rows.pop(pattern_id, None)
+        if row is None:
+            return
+        last = len(self._ids) - 1
+        if row != last:
+            moved_id = self._ids[last]
+            self._matrix[row] = self._matrix[last]
+            self._ids[row] = moved_id
+            self._rows[moved_id] = row
+        self._matrix[last] = 0
+        self._ids.pop()
+
+    def top_k(self, context: Dict[str, Any], k: int = 5) -> List[Tuple[float, str]]:
+        """Return up to k (cosine similarity, pattern_id) pairs, best first"""
+        count = len(self._ids)
+        if not count or not context or k <= 0:
+            return []
+        scores = self._matrix[:count] @ self.encode(context)
+        if k < count:
+            candidates = np.argpartition(scores, -k)[-k:]
+        else:
+            candidates = np.arange(count)
+        ranked = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(float(scores[row]), self._ids[row]) for row in ranked if scores[row] > 0]
+
+    def _add_feature(self, vector: "np.ndarray", feature: str, weight: float):
+        # crc32 is stable across processes, unlike the salted built-in hash()
+        digest = zlib.crc32(feature.encode("utf-8"))
+        sign = 1.0 if digest & 0x80000000 else -1.0
+        vector[digest % self.dim] += sign * weight
+
+def similarity_available() -> bool:
+    return np is not None
\ No newline at end of file
@@ -0,0 +1,234 @@
+from typing import Dict, Any, Hashable, List, Optional
+from pathlib import Path
+import json
+import sqlite3
+import threading
+from .sqlite_connection import ForkSafeConnection
+from .write_behind import WriteBehind
+
+class PatternStore:
+    """SQLite-backed storage for learned patterns and their metrics
+
+    Each learned pattern and each metric update is a single row upsert, so
+    the per-request cost stays constant no matter how much history has
+    accumulated. Upserts are queued write-behind and committed in batches
+    by a background thread; reads flush the queue first so they always
+    see every write. Patterns are read back one type at a time, on demand.
+    """
+
+    PATTERN_COLUMNS = {
+        "hits": "INTEGER NOT NULL DEFAULT 1",
+        "successes": "INTEGER NOT NULL DEFAULT 1",
+        "last_seen": "REAL NOT NULL DEFAULT 0",
+        "latency_ewma": "REAL",
+        "latency_window": "BLOB"
+    }
+
+    def __init__(self, path: Path, compact_every: int = 1000, flush_interval: float = 1.0,
+                 max_pending: int = 500):
+        self.path = Path(path)
+        self.compact_every = compact_every
+        self._writes_since_compaction = 0
+        self._lock = threading.Lock()
+        self._connection = ForkSafeConnection(self._connect)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS patterns (
+                pattern_type TEXT NOT NULL,
+                pattern_id TEXT NOT NULL,
+                data TEXT NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 1,
+                successes INTEGER NOT NULL DEFAULT 1,
+                last_seen REAL NOT NULL DEFAULT 0,
+                latency_ewma REAL,
+                latency_window BLOB,
+                PRIMARY KEY (pattern_type, pattern_id)
+            );
+            CREATE TABLE IF NOT EXISTS metrics (
+                pattern_type TEXT NOT NULL,
+                pattern_key TEXT NOT NULL,
+                success INTEGER NOT NULL DEFAULT 0,
+                failure INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (pattern_type, pattern_key)
+            );
+        """)
+        self._add_missing_columns()
+        self._conn.commit()
+        self._pending = WriteBehind(
+            self._apply,
+            interval=flush_interval,
+            max_pending=max_pending,
+            merge=self._merge_pending,
+            name="pattern-store"
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        # auto_vacuum only takes effect on a fresh database, before any table exists
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        return conn
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        return self._connection.get()
+
+    def _add_missing_columns(self):
+        """Databases created before pattern counters existed get the new columns"""
+        existing = {row[1] for row in self._conn.execute("PRAGMA table_info(patterns)")}
+        for column, definition in self.PATTERN_COLUMNS.items():
+            if column not in existing:
+                self._conn.execute(f"ALTER TABLE patterns ADD COLUMN {column} {definition}")
+
+    def is_empty(self) -> bool:
+        self.flush()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT EXISTS(SELECT 1 FROM patterns) OR EXISTS(SELECT 1 FROM metrics)"
+            ).fetchone()
+        return not row[0]
+
+    # Counters are added, not overwritten, so processes sharing the database never lose each other's hits
+    UPSERT_PATTERN = """
+        INSERT INTO patterns (pattern_type, pattern_id, data, hits, successes, last_seen, latency_ewma, latency_window)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (pattern_type, pattern_id)
+        DO UPDATE SET hits = hits + excluded.hits, successes = successes + excluded.successes,
+                      last_seen = MAX(last_seen, excluded.last_seen),
+                      latency_ewma = COALESCE(excluded.latency_ewma, latency_ewma),
+                      latency_window = COALESCE(excluded.latency_window, latency_window)"""
+
+    def upsert_pattern(self, pattern_type: str, pattern_id: str, data: Dict[str, Any], stats: Dict[str, Any]):
+        """Insert a pattern or add to the counters of the existing row
+
+        `stats` holds the hits and successes to add, plus the latest
+        last_seen and latency aggregates.
+        """
+        self._pending.put(("patterns", pattern_type, pattern_id), ("upsert", data, dict(stats)))
+
+    def write_patterns(self, pattern_type: str, upserts: Dict[str, Dict[str, Any]] = None,
+                       deletes: List[str] = ()):
+        """Queue several upserts (rows with data and counter increments) and deletes"""
+        for pattern_id, row in (upserts or {}).items():
+            self.upsert_pattern(pattern_type, pattern_id, row["data"], row)
+        for pattern_id in deletes:
+            self._pending.put(("patterns", pattern_type, pattern_id), ("delete",))
+
+    def load_patterns(self, pattern_type: str) -> Dict[str, Dict[str, Any]]:
+        """Load every pattern of one type in insertion order as rows with data and counters"""
+        self.flush()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT pattern_id, data, hits, successes, last_seen, latency_ewma, latency_window FROM patterns "
+                "WHERE pattern_type = ? ORDER BY rowid",
+                (pattern_type,)
+            ).fetchall()
+        return {
+            pattern_id: {
+                "data": json.loads(data),
+                "hits": hits,
+                "successes": successes,
+                "last_seen": last_seen,
+                "latency_ewma": latency_ewma,
+                "latency_window": latency_window
+            }
+            for pattern_id, data, hits, successes, last_seen, latency_ewma, latency_window in rows
+        }
+
+    def increment_metric(self, pattern_type: str, pattern_key: str, success: int = 0, failure: int = 0):
+        self._pending.put(("metrics", pattern_type, pattern_key), (success, failure))
+
+    def get_metric(self, pattern_type: str, pattern_key: str) -> Optional[Dict[str, int]]:
+        self.flush()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT success, failure FROM metrics WHERE pattern_type = ? AND pattern_key = ?",
+                (pattern_type, pattern_key)
+            ).fetchone()
+        return {"success": row[0], "failure": row[1]} if row else None
+
+    def import_json(self, learned_patterns: Dict[str, Any]):
+        """Import the legacy learned_patterns.json layout in one transaction"""
+        with self._lock, self._conn:
+            for pattern_type in ("code", "integration", "execution"):
+                for pattern_id, data in learned_patterns.get(f"{pattern_type}_patterns", {}).items():
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO patterns (pattern_type, pattern_id, data) VALUES (?, ?, ?)",
+                        (pattern_type, pattern_id, json.dumps(data, default=str))
+                    )
+            for pattern_type, metrics in learned_patterns.get("success_metrics", {}).items():
+                for pattern_key, metric in metrics.items():
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO metrics (pattern_type, pattern_key, success, failure) VALUES (?, ?, ?, ?)",
+                        (pattern_type, pattern_key, metric.get("success", 0), metric.get("failure", 0))
+                    )
+
+    def compact(self):
+        """Fold the write-ahead log into the database and release free pages"""
+        with self._lock:
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self._conn.execute("PRAGMA incremental_vacuum")
+            self._writes_since_compaction = 0
+
+    def flush(self):
+        """Commit every queued write now"""
+        self._pending.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return self._pending.stats()
+
+    def close(self):
+        self._pending.close()
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _merge_pending(key: Hashable, pending: Any, new: Any) -> Any:
+        # Metric and pattern counters add up; everything else in a pattern write is newest-wins
+        if key[0] == "metrics":
+            return (pending[0] + new[0], pending[1] + new[1])
+        if new[0] == "delete":
+            return new
+        _, data, stats = new
+        if pending[0] == "delete":
+            # Re-learned after a queued delete: the old row goes and the counters start over
+            return ("replace", data, stats)
+        merged = {
+            **stats,
+            "hits": pending[2]["hits"] + stats["hits"],
+            "successes": pending[2]["successes"] + stats["successes"],
+            "last_seen": max(pending[2]["last_seen"], stats["last_seen"])
+        }
+        return (pending[0], data, merged)
+
+    def _apply(self, batch: Dict[Hashable, Any]):
+        """Write one coalesced batch of queued updates in a single transaction"""
+        with self._lock, self._conn:
+            for (table, pattern_type, pattern_id), op in batch.items():
+                if table == "metrics":
+                    self._conn.execute(
+                        """INSERT INTO metrics (pattern_type, pattern_key, success, failure) VALUES (?, ?, ?, ?)
+                           ON CONFLICT (pattern_type, pattern_key)
+                           DO UPDATE SET success = success + excluded.success, failure = failure + excluded.failure""",
+                        (pattern_type, pattern_id, op[0], op[1])
+                    )
+                elif op[0] == "delete":
+                    self._conn.execute(
+                        "DELETE FROM patterns WHERE pattern_type = ? AND pattern_id = ?",
+                        (pattern_type, pattern_id)
+                    )
+                else:
+                    kind, data, stats = op
+                    if kind == "replace":
+                        self._conn.execute(
+                            "DELETE FROM patterns WHERE pattern_type = ? AND pattern_id = ?",
+                            (pattern_type, pattern_id)
+                        )
+                    self._conn.execute(self.UPSERT_PATTERN, (
+                        pattern_type, pattern_id, json.dumps(data, default=str),
+                        stats["hits"], stats["successes"], stats["last_seen"],
+                        stats.get("latency_ewma"), stats.get("latency_window")
+                    ))
+        self._writes_since_compaction += len(batch)
+        if self.compact_every and self._writes_since_compaction >= self.compact_every:
+            self.compact()
\ No newline at end of file
@@ -0,0 +1,67 @@
+from typing import Dict, Any, Optional, Callable, List
+import threading
+
+class PrefixCache:
+    """Past-key-values for registered prompt prefixes, computed once per model
+
+    Each entry holds the prefix token ids and the attention cache for all
+    but the last prefix token, so a prompt that starts with the prefix only
+    has to prefill its own suffix before decoding.
+    """
+
+    def __init__(self):
+        self.prefixes: List[str] = []
+        self._entries: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        self._compute_locks: Dict[tuple, threading.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def register(self, prefix: str):
+        if prefix and prefix not in self.prefixes:
+            self.prefixes.append(prefix)
+            # Longest prefix first so match() returns the most specific one
+            self.prefixes.sort(key=len, reverse=True)
+
+    def match(self, prompt: str) -> Optional[str]:
+        """Return the longest registered prefix the prompt starts with"""
+        for prefix in self.prefixes:
+            if prompt.startswith(prefix):
+                return prefix
+        return None
+
+    def get(self, model_name: str, prefix: str, compute: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """Return the cached prefill for a prefix, computing it on first use"""
+        with self._lock:
+            entry = self._entries.get(model_name, {}).get(prefix)
+            if entry is not None:
+                self.hits += 1
+                return entry
+            compute_lock = self._compute_locks.setdefault((model_name, prefix), threading.Lock())
+
+        with compute_lock:
+            with self._lock:
+                entry = self._entries.get(model_name, {}).get(prefix)
+            if entry is None:
+                entry = compute()
+                with self._lock:
+                    self.misses += 1
+                    self._entries.setdefault(model_name, {})[prefix] = entry
+            else:
+                with self._lock:
+                    self.hits += 1
+            return entry
+
+    def invalidate(self, model_name: str):
+        """Forget every prefill computed with a model that is being unloaded"""
+        with self._lock:
+            self._entries.pop(model_name, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "prefixes": len(self.prefixes),
+                "models": {name: len(entries) for name, entries in self._entries.items()},
+                "hits": self.hits,
+                "misses": self.misses
+            }
\ No newline at end of file
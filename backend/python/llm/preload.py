@@ -0,0 +1,141 @@
+from typing import Dict, Any
+from pathlib import Path
+import json
+import mmap
+import os
+import struct
+import threading
+import torch
+from accelerate import init_empty_weights
+from safetensors.torch import save_file
+from transformers import AutoConfig, AutoModelForCausalLM
+
+MMAP_WEIGHTS = "model.safetensors"
+
+SAFETENSORS_DTYPES = {
+    "F64": torch.float64,
+    "F32": torch.float32,
+    "F16": torch.float16,
+    "BF16": torch.bfloat16,
+    "I64": torch.int64,
+    "I32": torch.int32,
+    "I16": torch.int16,
+    "I8": torch.int8,
+    "U8": torch.uint8,
+    "BOOL": torch.bool
+}
+
+SMAPS_FIELDS = {
+    "Rss": "rss_mb",
+    "Pss": "pss_mb",
+    "Shared_Clean": "shared_clean_mb",
+    "Shared_Dirty": "shared_dirty_mb",
+    "Private_Clean": "private_clean_mb",
+    "Private_Dirty": "private_dirty_mb"
+}
+
+def load_mmap_model(path: str, cache_root: Path) -> Any:
+    """Load a float model whose weights are memory-mapped from a safetensors cache
+
+    The first load reads `path` normally and writes config and weights to
+    the cache; every load then maps the cached file, so all processes
+    serving the model share the same page-cache pages.
+    """
+    cache_dir = Path(cache_root) / path.strip("/").replace("/", "--")
+    weights = cache_dir / MMAP_WEIGHTS
+    if weights.exists():
+        # Parameters on the meta device: no float copy is allocated or initialised only to be
+        # replaced by the mapping. Buffers stay real, since non-persistent ones are not in the file
+        with init_empty_weights(include_buffers=False):
+            model = AutoModelForCausalLM.from_config(AutoConfig.from_pretrained(cache_dir))
+    else:
+        model = AutoModelForCausalLM.from_pretrained(path, low_cpu_mem_usage=True)
+        save_mmap_weights(model, cache_dir)
+    map_weights(model, weights)
+    model.eval()
+    return model
+
+def save_mmap_weights(model: Any, directory: Path):
+    """Write a model's config and weights as safetensors, storing tied tensors once"""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    model.config.save_pretrained(directory)
+
+    tensors: Dict[str, torch.Tensor] = {}
+    aliases: Dict[str, str] = {}
+    owners: Dict[tuple, str] = {}
+    for name, tensor in model.state_dict().items():
+        key = (tensor.data_ptr(), tensor.nelement(), tensor.dtype)
+        if key in owners:
+            aliases[name] = owners[key]
+            continue
+        owners[key] = name
+        tensors[name] = tensor.detach().cpu().contiguous()
+
+    # Written under a temporary name so concurrent workers never map a partial file
+    tmp_path = directory / f"{MMAP_WEIGHTS}.{os.getpid()}.{threading.get_ident()}.tmp"
+    save_file(tensors, str(tmp_path), metadata={"aliases": json.dumps(aliases)})
+    os.replace(tmp_path, directory / MMAP_WEIGHTS)
+
+def map_weights(model: Any, weights: Path):
+    """Point every parameter and buffer at a private copy-on-write mapping of `weights`
+
+    Pages stay shared with the page cache, and so with every other
+    process mapping the same file, until something writes to them.
+    """
+    with open(weights, "rb") as f:
+        header_size = struct.unpack("<Q", f.read(8))[0]
+        header = json.loads(f.read(header_size))
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    data_start = 8 + header_size
+    aliases = json.loads(header.pop("__metadata__", {}).get("aliases", "{}"))
+
+    tensors: Dict[str, torch.Tensor] = {}
+    for name, info in header.items():
+        start, end = info["data_offsets"]
+        dtype = SAFETENSORS_DTYPES[info["dtype"]]
+        count = (end - start) // torch.empty((), dtype=dtype).element_size()
+        tensor = torch.frombuffer(mapped, dtype=dtype, count=count, offset=data_start + start) if count else torch.empty(0, dtype=dtype)
+        tensors[name] = tensor.view(info["shape"])
+    for alias, source in aliases.items():
+        tensors[alias] = tensors[source]
+
+    # Replaced rather than assigned through .data, which cannot move a meta parameter;
+    # names tied to one tensor share one Parameter again
+    parameters: Dict[int, torch.nn.Parameter] = {}
+    for name, _ in list(model.named_parameters(remove_duplicate=False)):
+        if name in tensors:
+            tensor = tensors[name]
+            if id(tensor) not in parameters:
+                parameters[id(tensor)] = torch.nn.Parameter(tensor, requires_grad=False)
+            _set_tensor(model, name, "_parameters", parameters[id(tensor)])
+    for name, _ in list(model.named_buffers(remove_duplicate=False)):
+        if name in tensors:
+            _set_tensor(model, name, "_buffers", tensors[name])
+    # The tensors reference the mapping; keep it reachable from the model as well
+    model._mapped_weights = mapped
+
+def _set_tensor(model: Any, name: str, kind: str, tensor: torch.Tensor):
+    module_name, _, attribute = name.rpartition(".")
+    module = model.get_submodule(module_name) if module_name else model
+    getattr(module, kind)[attribute] = tensor
+
+def memory_usage() -> Dict[str, Any]:
+    """This process's resident memory split into shared and private pages, in MB
+
+    Read from /proc/self/smaps_rollup, so only Linux reports page details.
+    """
+    usage: Dict[str, Any] = {"pid": os.getpid()}
+    try:
+        with open("/proc/self/smaps_rollup", "r") as f:
+            lines = f.readlines()
+    except OSError:
+        return usage
+
+    for line in lines:
+        parts = line.split()
+        if len(parts) >= 2 and parts[0].rstrip(":") in SMAPS_FIELDS:
+            usage[SMAPS_FIELDS[parts[0].rstrip(":")]] = round(int(parts[1]) / 1024, 1)
+    usage["shared_mb"] = round(usage.get("shared_clean_mb", 0) + usage.get("shared_dirty_mb", 0), 1)
+    usage["private_mb"] = round(usage.get("private_clean_mb", 0) + usage.get("private_dirty_mb", 0), 1)
+    return usage
\ No newline at end of file
@@ -0,0 +1,102 @@
+from typing import Any, Optional
+from pathlib import Path
+import torch
+from accelerate import init_empty_weights
+from transformers import AutoConfig, AutoModelForCausalLM
+from transformers.pytorch_utils import Conv1D
+
+QUANTIZED_WEIGHTS = "model_int8.pt"
+
+def quantize_dynamic_int8(model: Any) -> Any:
+    """Quantize a model's linear layers to int8 for CPU inference
+
+    Weights are stored as int8 and activations are quantized on the fly,
+    which shrinks the linear layers about 4x and uses the int8 matmul
+    kernels on x86 and ARM CPUs.
+    """
+    model.eval()
+    _conv1d_to_linear(model)
+    quantized = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    quantized.quantization_mode = "int8"
+    return quantized
+
+def _conv1d_to_linear(model: Any):
+    """GPT-2 style models use Conv1D for their projections; turn them into Linear so they get quantized"""
+    for module in list(model.modules()):
+        for child_name, child in list(module.named_children()):
+            if isinstance(child, Conv1D):
+                in_features, out_features = child.weight.shape
+                linear = torch.nn.Linear(in_features, out_features)
+                linear.weight.data = child.weight.data.t().contiguous()
+                linear.bias.data = child.bias.data
+                setattr(module, child_name, linear)
+
+def save_quantized(model: Any, directory: Path):
+    """Persist a quantized model's config and int8 state dict"""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    model.config.save_pretrained(directory)
+    torch.save(model.state_dict(), directory / QUANTIZED_WEIGHTS)
+
+def load_quantized(directory: Path) -> Any:
+    """Rebuild a quantized model from save_quantized output without touching float weights"""
+    directory = Path(directory)
+    config = AutoConfig.from_pretrained(directory)
+    # Parameters on the meta device, so no float copy is allocated, initialised or
+    # quantized; empty int8 layers and the remaining tensors are filled from the file
+    with init_empty_weights(include_buffers=False):
+        model = AutoModelForCausalLM.from_config(config)
+        _conv1d_to_linear(model)
+    model.eval()
+    _linear_to_dynamic_int8_shells(model)
+    model.load_state_dict(torch.load(directory / QUANTIZED_WEIGHTS, map_location="cpu"), assign=True)
+    model.quantization_mode = "int8"
+    return model
+
+def _linear_to_dynamic_int8_shells(model: Any):
+    """Replace Linear layers with the int8 dynamic layers quantize_dynamic_int8 makes, left unfilled"""
+    for module in list(model.modules()):
+        for child_name, child in list(module.named_children()):
+            if type(child) is torch.nn.Linear:
+                setattr(module, child_name, torch.ao.nn.quantized.dynamic.Linear(
+                    child.in_features, child.out_features, bias_=child.bias is not None, dtype=torch.qint8
+                ))
+
+def load_int8_model(path: str, quantized_path: Optional[str] = None) -> Any:
+    """Load an int8 model, reusing persisted quantized weights when they exist"""
+    if quantized_path and (Path(quantized_path) / QUANTIZED_WEIGHTS).exists():
+        return load_quantized(Path(quantized_path))
+
+    model = AutoModelForCausalLM.from_pretrained(
+        path,
+        torch_dtype=torch.float32,
+        low_cpu_mem_usage=True
+    )
+    model = quantize_dynamic_int8(model)
+    if quantized_path:
+        save_quantized(model, Path(quantized_path))
+    return model
+
+def state_dict_bytes(model: Any) -> int:
+    """Size of every tensor in a state dict, counting shared storage once
+
+    Quantized linear layers keep their packed weights outside
+    `parameters()`, so this is the reliable footprint for them.
+    """
+    seen = set()
+    total = 0
+
+    def add(value: Any):
+        nonlocal total
+        if isinstance(value, torch.Tensor):
+            key = (value.data_ptr(), value.nelement())
+            if key not in seen:
+                seen.add(key)
+                total += value.nelement() * value.element_size()
+        elif isinstance(value, (tuple, list)):
+            for item in value:
+                add(item)
+
+    for value in model.state_dict().values():
+        add(value)
+    return total
\ No newline at end of file
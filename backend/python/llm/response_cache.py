@@ -0,0 +1,157 @@
+from typing import Dict, Any, Optional
+from collections import OrderedDict
+from pathlib import Path
+import hashlib
+import json
+import os
+import threading
+import time
+
+class ResponseCache:
+    """Content-addressed cache of generated responses
+
+    Entries are keyed on a hash of (model, prompt, generation params) and
+    kept in an in-memory LRU tier. When `disk_path` is set, entries are also
+    written to one JSON file per key so they survive restarts.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: Optional[float] = 3600,
+                 disk_path: Optional[str] = None, max_disk_entries: int = 10000):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_entries = max(1, int(max_disk_entries))
+        self.disk_path = Path(disk_path) if disk_path else None
+        if self.disk_path:
+            self.disk_path.mkdir(parents=True, exist_ok=True)
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_entries = len(list(self.disk_path.glob("*.json"))) if self.disk_path else 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(model: str, prompt: str, params: Dict[str, Any]) -> str:
+        payload = json.dumps({"model": model, "prompt": prompt, "params": params}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return a cached value, promoting disk hits into memory"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if self._expired(entry, now):
+                    del self._memory[key]
+                else:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return entry["value"]
+
+        entry = self._read_disk(key, now)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+            self._put_memory(key, entry)
+            return entry["value"]
+
+    def set(self, key: str, value: Any):
+        entry = {
+            "value": value,
+            "expires_at": time.time() + self.ttl_seconds if self.ttl_seconds else None
+        }
+        with self._lock:
+            self._put_memory(key, entry)
+        self._write_disk(key, entry)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self.disk_path:
+            for path in self.disk_path.glob("*.json"):
+                path.unlink(missing_ok=True)
+            with self._lock:
+                self._disk_entries = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "memory_entries": len(self._memory),
+            "disk_entries": self._disk_entries
+        }
+
+    def _expired(self, entry: Dict[str, Any], now: float) -> bool:
+        return entry["expires_at"] is not None and entry["expires_at"] <= now
+
+    def _put_memory(self, key: str, entry: Dict[str, Any]):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def _read_disk(self, key: str, now: float) -> Optional[Dict[str, Any]]:
+        if not self.disk_path:
+            return None
+        path = self.disk_path / f"{key}.json"
+        try:
+            with open(path, 'r') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if self._expired(entry, now):
+            path.unlink(missing_ok=True)
+            return None
+        return entry
+
+    def _write_disk(self, key: str, entry: Dict[str, Any]):
+        if not self.disk_path:
+            return
+        path = self.disk_path / f"{key}.json"
+        is_new = not path.exists()
+        tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+        except OSError:
+            tmp_path.unlink(missing_ok=True)
+            return
+        if is_new:
+            with self._lock:
+                self._disk_entries += 1
+                over_limit = self._disk_entries > self.max_disk_entries
+            if over_limit:
+                self._prune_disk()
+
+    def _prune_disk(self):
+        """Drop the oldest tenth of the disk tier once it is over its limit"""
+        # Other threads and worker processes sharing the directory remove files while it is scanned
+        aged = []
+        for path in self.disk_path.glob("*.json"):
+            try:
+                aged.append((path.stat().st_mtime, path))
+            except FileNotFoundError:
+                continue
+        aged.sort()
+        excess = len(aged) - self.max_disk_entries
+        removed = 0
+        for _, path in aged[:max(excess, self.max_disk_entries // 10)]:
+            try:
+                path.unlink()
+                removed += 1
+            except FileNotFoundError:
+                continue
+        remaining = len(list(self.disk_path.glob("*.json")))
+        with self._lock:
+            self.evictions += removed
+            self._disk_entries = remaining
\ No newline at end of file
@@ -0,0 +1,81 @@
+from typing import Callable, List, Optional
+import threading
+from .adaptive_config import AdaptiveConfig
+from .model_manager import ModelManager
+
+class ServiceRegistry:
+    """Process-wide ModelManager and AdaptiveConfig shared by every service object
+
+    However many LLMService, TaskHandler or IntegrationManager instances a
+    process creates, they all reference one set of loaded models and
+    caches and one pattern store. startup() builds the shared instances
+    eagerly; otherwise the first accessor does. shutdown() runs the
+    registered hooks, flushes pending writes and stops worker threads.
+    """
+
+    _lock = threading.RLock()
+    _model_manager: Optional[ModelManager] = None
+    _adaptive_config: Optional[AdaptiveConfig] = None
+    _llm_service = None
+    _shutdown_hooks: List[Callable[[], None]] = []
+
+    @classmethod
+    def model_manager(cls) -> ModelManager:
+        with cls._lock:
+            if cls._model_manager is None:
+                cls._model_manager = ModelManager()
+            return cls._model_manager
+
+    @classmethod
+    def adaptive_config(cls) -> AdaptiveConfig:
+        with cls._lock:
+            if cls._adaptive_config is None:
+                cls._adaptive_config = AdaptiveConfig()
+            return cls._adaptive_config
+
+    @classmethod
+    def llm_service(cls):
+        # Imported here because LLMService falls back to this registry for its defaults
+        from .llm_service import LLMService
+        with cls._lock:
+            if cls._llm_service is None:
+                cls._llm_service = LLMService(cls.model_manager(), cls.adaptive_config())
+            return cls._llm_service
+
+    @classmethod
+    def startup(cls, preload: Optional[bool] = None):
+        """Create the shared model manager, pattern store and LLM service up front
+
+        With preload (by default the "preload" section of
+        models_config.json) local models are loaded now as well, so a
+        pre-fork server master shares them with its workers.
+        """
+        model_manager = cls.llm_service().model_manager
+        if preload is None:
+            preload = model_manager.preload_config.get("enabled", False)
+        if preload:
+            model_manager.preload()
+
+    @classmethod
+    def on_shutdown(cls, hook: Callable[[], None]):
+        """Run `hook` during shutdown(), before the shared services are closed"""
+        with cls._lock:
+            cls._shutdown_hooks.append(hook)
+
+    @classmethod
+    def shutdown(cls):
+        """Run shutdown hooks, then flush and stop the shared services"""
+        with cls._lock:
+            hooks, cls._shutdown_hooks = cls._shutdown_hooks, []
+            model_manager, adaptive_config = cls._model_manager, cls._adaptive_config
+            cls._model_manager = cls._adaptive_config = cls._llm_service = None
+
+        for hook in reversed(hooks):
+            try:
+                hook()
+            except Exception as e:
+                print(f"Shutdown hook failed: {str(e)}")
+        if model_manager is not None:
+            model_manager.shutdown()
+        if adaptive_config is not None:
+            adaptive_config.close()
\ No newline at end of file
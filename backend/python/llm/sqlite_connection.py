@@ -0,0 +1,21 @@
+from typing import Callable
+import os
+import sqlite3
+
+class ForkSafeConnection:
+    """A SQLite connection that is reopened in every process that uses it
+
+    SQLite connections must not cross fork(); a pre-forked worker that
+    inherits one gets its own from `connect` the first time it asks.
+    """
+
+    def __init__(self, connect: Callable[[], sqlite3.Connection]):
+        self._connect = connect
+        self._pid = os.getpid()
+        self._connection = connect()
+
+    def get(self) -> sqlite3.Connection:
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._connection = self._connect()
+        return self._connection
\ No newline at end of file
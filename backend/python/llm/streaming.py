@@ -0,0 +1,27 @@
+from typing import Callable
+import threading
+from transformers import TextStreamer, StoppingCriteria
+
+class CallbackTextStreamer(TextStreamer):
+    """Text streamer that hands each decoded chunk to a callback
+
+    `generate` calls the streamer from the inference worker thread, so
+    the callback is responsible for handing chunks back to the event loop.
+    """
+
+    def __init__(self, tokenizer, on_text: Callable[[str], None], **decode_kwargs):
+        super().__init__(tokenizer, skip_prompt=True, **decode_kwargs)
+        self.on_text = on_text
+
+    def on_finalized_text(self, text: str, stream_end: bool = False):
+        if text:
+            self.on_text(text)
+
+class CancelCriteria(StoppingCriteria):
+    """Stops generation once the consumer of a stream has gone away"""
+
+    def __init__(self, cancelled: threading.Event):
+        self.cancelled = cancelled
+
+    def __call__(self, input_ids, scores, **kwargs) -> bool:
+        return self.cancelled.is_set()
\ No newline at end of file
@@ -1,25 +1,58 @@
-from typing import Dict, Any
+from typing import Dict, Any, AsyncContextManager, Callable, List, Optional
 from .llm_service import LLMService
 from .config import LLMConfig
+from .service_registry import ServiceRegistry
 
 class TaskHandler:
-    def __init__(self):
-        self.llm_service = LLMService()
+    def __init__(self, llm_service: Optional[LLMService] = None):
+        self.llm_service = llm_service or ServiceRegistry.llm_service()
         self.config = LLMConfig()
 
-    def analyze_task(self, task_data: Dict[str, Any]) -> Dict[str, Any]:
+    async def analyze_task(self, task_data: Dict[str, Any]) -> Dict[str, Any]:
         """Analyze task and determine if it needs dynamic code generation"""
-        prompt = f"""Analyze this task and determine if it requires dynamic code generation:
+        return await self.llm_service.process_input(self._analysis_prompt(task_data))
+
+    async def analyze_tasks(self, tasks: List[Dict[str, Any]], max_concurrency: int = 8,
+                            item_timeout: Optional[float] = None,
+                            slot: Optional[Callable[[], AsyncContextManager]] = None) -> List[Dict[str, Any]]:
+        """Analyze many tasks in one grouped pipeline run, one result per task in order"""
+        return await self._process_batch(self._analysis_prompt, tasks, max_concurrency, item_timeout, slot)
+
+    def _analysis_prompt(self, task_data: Dict[str, Any]) -> str:
+        return f"""Analyze this task and determine if it requires dynamic code generation:
         Task Name: {task_data.get('name')}
         Description: {task_data.get('description')}
         Type: {task_data.get('type')}
         """
+
+    async def run_task(self, task: Any) -> Dict[str, Any]:
+        """Run a queued orchestrator task through the LLM pipeline"""
+        prompt = f"""Execute this task and report the outcome:
+        Task Name: {task.name}
+        Description: {task.description}
+        Type: {task.type}
+        """
         
-        return self.llm_service.process_input(prompt)
+        return await self.llm_service.process_input(prompt)
 
-    def generate_java_code(self, task_data: Dict[str, Any], context: Dict[str, Any]) -> Dict[str, Any]:
+    async def generate_java_code(self, task_data: Dict[str, Any], context: Dict[str, Any]) -> Dict[str, Any]:
         """Generate Java code for task execution"""
-        prompt = f"""Generate Java code to execute this task:
+        return await self.llm_service.process_input(self._generation_prompt(task_data, context))
+
+    async def generate_java_code_many(self, items: List[Dict[str, Any]], max_concurrency: int = 8,
+                                      item_timeout: Optional[float] = None,
+                                      slot: Optional[Callable[[], AsyncContextManager]] = None) -> List[Dict[str, Any]]:
+        """Generate Java code for many {"task": ..., "context": ...} items, one result per item in order"""
+        return await self._process_batch(
+            lambda item: self._generation_prompt(item["task"], item.get("context")),
+            items,
+            max_concurrency,
+            item_timeout,
+            slot
+        )
+
+    def _generation_prompt(self, task_data: Dict[str, Any], context: Dict[str, Any]) -> str:
+        return f"""Generate Java code to execute this task:
         Task Details: {task_data}
         Context: {context}
         Requirements:
@@ -28,13 +61,29 @@ class TaskHandler:
         3. Include logging
         4. Follow best practices
         """
-        
-        return self.llm_service.process_input(prompt)
 
-    def execute_dynamic_code(self, task_data: Dict[str, Any], code: str) -> Dict[str, Any]:
+    async def _process_batch(self, build_prompt: Callable[[Any], str], items: List[Any],
+                             max_concurrency: int, item_timeout: Optional[float],
+                             slot: Optional[Callable[[], AsyncContextManager]]) -> List[Dict[str, Any]]:
+        """Run the valid items through LLMService.process_many; malformed items fail on their own"""
+        results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+        prompts, positions = [], []
+        for index, item in enumerate(items):
+            try:
+                prompts.append(build_prompt(item))
+                positions.append(index)
+            except (AttributeError, KeyError, TypeError) as e:
+                results[index] = {"success": False, "error": f"Invalid item: {str(e)}"}
+
+        for index, result in zip(positions, await self.llm_service.process_many(
+                prompts, max_concurrency, item_timeout, slot)):
+            results[index] = result
+        return [dict(result, index=index) for index, result in enumerate(results)]
+
+    async def execute_dynamic_code(self, task_data: Dict[str, Any], code: str) -> Dict[str, Any]:
         """Execute dynamically generated code"""
         # Validate the code first
-        validated_code = self.llm_service._validate_code(code)
+        validated_code = await self.llm_service._validate_code(code)
         if not validated_code:
             return {
                 'success': False,
@@ -43,7 +92,7 @@ class TaskHandler:
 
         # Deploy and execute the code
         try:
-            deployment_result = self.llm_service._deploy_code(validated_code)
+            deployment_result = await self.llm_service._deploy_code(validated_code)
             if deployment_result['success']:
                 return {
                     'success': True,
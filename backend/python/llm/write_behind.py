@@ -0,0 +1,119 @@
+from typing import Dict, Any, Callable, Hashable, Optional
+import atexit
+import os
+import threading
+
+class WriteBehind:
+    """Buffers writes in memory and persists them from a background thread
+
+    Updates to the same key coalesce: the newest value wins, unless a
+    `merge(key, pending, new)` function combines them. Pending writes are
+    handed to `flush_fn` as one dict every `interval` seconds, as soon as
+    `max_pending` keys are dirty, and on close() or interpreter exit.
+    """
+
+    def __init__(self, flush_fn: Callable[[Dict[Hashable, Any]], None], interval: float = 1.0,
+                 max_pending: int = 500, merge: Optional[Callable[[Hashable, Any, Any], Any]] = None,
+                 name: str = "write-behind"):
+        self.flush_fn = flush_fn
+        self.interval = interval
+        self.max_pending = max_pending
+        self.merge = merge
+        self.name = name
+        self._pending: Dict[Hashable, Any] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pid = os.getpid()
+        self._exit_hook = False
+        self._closed = False
+        self.flushes = 0
+        self.flushed_items = 0
+        self.coalesced = 0
+        self.errors = 0
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def put(self, key: Hashable, value: Any):
+        self._check_fork()
+        with self._lock:
+            self._queue(key, value)
+            pending = len(self._pending)
+            # Started on first write so a pre-fork master never owns the thread
+            if self._thread is None and not self._closed:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+                if not self._exit_hook:
+                    atexit.register(self.close)
+                    self._exit_hook = True
+        if pending >= self.max_pending:
+            self._wake.set()
+
+    def _check_fork(self):
+        if self._pid != os.getpid():
+            self._reset_after_fork()
+
+    def _reset_after_fork(self):
+        """A forked child inherits neither the flusher thread nor ownership of the parent's pending writes"""
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._pending = {}
+
+    def flush(self):
+        """Persist everything pending now, in the calling thread"""
+        # The parent still owns and flushes what was pending at fork(); writing it here too would count it twice
+        self._check_fork()
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return
+                batch, self._pending = self._pending, {}
+            try:
+                self.flush_fn(batch)
+                self.flushes += 1
+                self.flushed_items += len(batch)
+            except Exception as e:
+                self.errors += 1
+                print(f"Failed to flush {len(batch)} pending writes: {str(e)}")
+                # Keep the batch for the next attempt, under anything written since
+                with self._lock:
+                    newer, self._pending = self._pending, batch
+                    for key, value in newer.items():
+                        self._queue(key, value)
+
+    def close(self):
+        """Stop the background thread and flush what is left"""
+        self._check_fork()
+        self._closed = True
+        self._wake.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": len(self._pending),
+            "flushes": self.flushes,
+            "flushed_items": self.flushed_items,
+            "coalesced": self.coalesced,
+            "errors": self.errors
+        }
+
+    def _queue(self, key: Hashable, value: Any):
+        if key in self._pending:
+            self.coalesced += 1
+            if self.merge:
+                value = self.merge(key, self._pending[key], value)
+        self._pending[key] = value
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
\ No newline at end of file
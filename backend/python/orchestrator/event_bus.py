@@ -0,0 +1,92 @@
+from typing import Dict, Any, Callable, List, Optional
+import queue
+import threading
+
+class Subscription:
+    """One subscriber's bounded queue of events
+
+    A subscriber that falls `max_queue` events behind is closed with
+    reason "overflow" rather than slowing down publishers; it should
+    re-sync (for example from the task list) and subscribe again.
+    """
+
+    def __init__(self, bus: "EventBus", predicate: Optional[Callable[[Dict[str, Any]], bool]], max_queue: int):
+        self.bus = bus
+        self.predicate = predicate
+        self.closed = False
+        self.reason: Optional[str] = None
+        self.delivered = 0
+        self._events: "queue.Queue" = queue.Queue(max_queue)
+
+    def get(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Next event, or None on timeout or once the subscription is closed"""
+        try:
+            return self._events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self, reason: str = "closed"):
+        if self.closed:
+            return
+        self.closed = True
+        self.reason = reason
+        self.bus._unsubscribe(self)
+        # Wake a reader blocked in get(); if the queue is full it is not blocked
+        try:
+            self._events.put_nowait(None)
+        except queue.Full:
+            pass
+
+    def _offer(self, event: Dict[str, Any]):
+        if self.predicate is not None and not self.predicate(event):
+            return
+        try:
+            self._events.put_nowait(event)
+            self.delivered += 1
+        except queue.Full:
+            self.close("overflow")
+
+class EventBus:
+    """In-process publish/subscribe for task events
+
+    publish() never blocks: each subscriber has its own bounded queue and
+    an optional predicate deciding which events it receives.
+    """
+
+    def __init__(self, max_queue: int = 1000):
+        self.max_queue = max_queue
+        self._subscriptions: List[Subscription] = []
+        self._lock = threading.Lock()
+        self.published = 0
+
+    @property
+    def has_subscribers(self) -> bool:
+        return bool(self._subscriptions)
+
+    def subscribe(self, predicate: Optional[Callable[[Dict[str, Any]], bool]] = None,
+                  max_queue: Optional[int] = None) -> Subscription:
+        subscription = Subscription(self, predicate, max_queue or self.max_queue)
+        with self._lock:
+            self._subscriptions = self._subscriptions + [subscription]
+        return subscription
+
+    def publish(self, event: Dict[str, Any]):
+        self.published += 1
+        # Copy-on-write list, so publishing needs no lock
+        for subscription in self._subscriptions:
+            subscription._offer(event)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "subscribers": len(self._subscriptions),
+            "published": self.published
+        }
+
+    def close(self):
+        """Close every subscription, ending their streams"""
+        for subscription in list(self._subscriptions):
+            subscription.close("shutdown")
+
+    def _unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscriptions = [s for s in self._subscriptions if s is not subscription]
\ No newline at end of file
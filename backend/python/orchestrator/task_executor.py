@@ -0,0 +1,202 @@
+from typing import Dict, Any, Awaitable, Callable, List, Optional, Tuple
+from collections import defaultdict, deque
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from .task_manager import Task, TaskManager
+
+class TaskExecutor:
+    """Runs queued tasks through a handler on a pool of worker coroutines
+
+    Pending tasks wait in a priority queue, higher priority first and
+    FIFO within a priority. `workers` coroutines on the event loop of
+    `runner` (anything with a `loop` property, such as
+    llm.async_runner.AsyncRunner) take the best task whose type is below
+    its `type_limits` entry and await `handler(task)`. Tasks move through
+    pending, running and succeeded, failed or cancelled; a handler result
+    of {"success": False, ...} counts as a failure.
+    """
+
+    def __init__(self, task_manager: TaskManager, handler: Callable[[Task], Awaitable[Any]], runner: Any,
+                 workers: int = 4, type_limits: Optional[Dict[str, int]] = None):
+        self.task_manager = task_manager
+        self.handler = handler
+        self.runner = runner
+        self.workers = max(1, int(workers))
+        self.type_limits = {task_type: int(limit) for task_type, limit in (type_limits or {}).items()}
+        # Entries are (-priority, sequence, task id, task type); only touched on the loop thread
+        self._queue: List[Tuple[int, int, str, str]] = []
+        self._sequence = itertools.count()
+        self._running: Dict[str, asyncio.Future] = {}
+        self._running_by_type: Dict[str, int] = defaultdict(int)
+        self._cancel_requested = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._worker_tasks = set()
+        self._lock = threading.Lock()
+        self._finished_at: deque = deque(maxlen=10000)
+        self._runs = 0
+        self._run_seconds = 0.0
+        self.submitted = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.cancelled = 0
+
+    def start(self):
+        # Started on first submit so a pre-fork master never owns the workers
+        with self._lock:
+            if self._loop is not None:
+                return
+            self._loop = self.runner.loop
+            for _ in range(self.workers):
+                asyncio.run_coroutine_threadsafe(self._worker(), self._loop)
+
+    def submit(self, task: Task) -> Task:
+        """Queue a pending task for execution"""
+        self.start()
+        with self._lock:
+            self.submitted += 1
+        self._loop.call_soon_threadsafe(self._enqueue, task.id, task.priority, task.type)
+        return task
+
+    def cancel(self, task_id: str, timeout: Optional[float] = 5) -> bool:
+        """Cancel a pending or running task; False if it is unknown or already finished"""
+        if self._loop is None:
+            return self._cancel_pending(task_id)
+        return asyncio.run_coroutine_threadsafe(self._cancel(task_id), self._loop).result(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.time()
+        queued_by_type: Dict[str, int] = defaultdict(int)
+        for _, _, task_id, task_type in list(self._queue):
+            task = self.task_manager.get_task(task_id)
+            if task is not None and task.status == 'pending':
+                queued_by_type[task_type] += 1
+        return {
+            "workers": self.workers,
+            "type_limits": self.type_limits,
+            "queue_depth": sum(queued_by_type.values()),
+            "queued_by_type": dict(queued_by_type),
+            "running": len(self._running),
+            "running_by_type": {t: n for t, n in self._running_by_type.items() if n},
+            "submitted": self.submitted,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "throughput_per_minute": sum(1 for t in self._finished_at if now - t <= 60),
+            "avg_run_seconds": self._run_seconds / self._runs if self._runs else None
+        }
+
+    def shutdown(self, timeout: Optional[float] = 5):
+        """Stop the workers; interrupted tasks go back to pending"""
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None or loop.is_closed():
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._stop_workers(), loop).result(timeout)
+        except Exception as e:
+            print(f"Failed to stop task workers: {str(e)}")
+        self._wakeup = None
+        self._queue = []
+
+    def _enqueue(self, task_id: str, priority: int, task_type: str):
+        heapq.heappush(self._queue, (-priority, next(self._sequence), task_id, task_type))
+        self._event().set()
+
+    def _event(self) -> asyncio.Event:
+        # Created on the loop thread, so it binds to the loop it is used on
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        return self._wakeup
+
+    def _next_eligible(self) -> Optional[Tuple[int, int, str, str]]:
+        """Pop the highest-priority pending task whose type has a free slot"""
+        blocked = []
+        found = None
+        while self._queue:
+            item = heapq.heappop(self._queue)
+            task = self.task_manager.get_task(item[2])
+            if task is None or task.status != 'pending':
+                continue  # cancelled while queued
+            limit = self.type_limits.get(item[3])
+            if limit is not None and self._running_by_type[item[3]] >= limit:
+                blocked.append(item)
+                continue
+            found = item
+            break
+        for item in blocked:
+            heapq.heappush(self._queue, item)
+        return found
+
+    async def _stop_workers(self):
+        workers, self._worker_tasks = self._worker_tasks, set()
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    async def _worker(self):
+        self._worker_tasks.add(asyncio.current_task())
+        while True:
+            item = self._next_eligible()
+            if item is None:
+                event = self._event()
+                event.clear()
+                await event.wait()
+                continue
+            await self._execute(item[2], item[3])
+
+    async def _execute(self, task_id: str, task_type: str):
+        task = self.task_manager.update_task_status(task_id, 'running')
+        self._running_by_type[task_type] += 1
+        run = asyncio.ensure_future(self.handler(task))
+        self._running[task_id] = run
+        started = time.perf_counter()
+        try:
+            result = await run
+            if isinstance(result, dict) and result.get('success') is False:
+                self.failed += 1
+                self.task_manager.update_task_status(task_id, 'failed', result=result, error=result.get('error'))
+            else:
+                self.succeeded += 1
+                self.task_manager.update_task_status(task_id, 'succeeded', result=result)
+        except asyncio.CancelledError:
+            if task_id not in self._cancel_requested:
+                # The worker itself is stopping; leave the task to be run again
+                self.task_manager.update_task_status(task_id, 'pending')
+                raise
+            self.cancelled += 1
+            self.task_manager.update_task_status(task_id, 'cancelled')
+        except Exception as e:
+            print(f"Task {task_id} failed: {str(e)}")
+            self.failed += 1
+            self.task_manager.update_task_status(task_id, 'failed', error=str(e))
+        finally:
+            self._running.pop(task_id, None)
+            self._running_by_type[task_type] -= 1
+            self._cancel_requested.discard(task_id)
+            self._runs += 1
+            self._run_seconds += time.perf_counter() - started
+            self._finished_at.append(time.time())
+            # A slot for this type is free again; blocked tasks may now run
+            self._event().set()
+
+    async def _cancel(self, task_id: str) -> bool:
+        run = self._running.get(task_id)
+        if run is None:
+            return self._cancel_pending(task_id)
+        self._cancel_requested.add(task_id)
+        run.cancel()
+        return True
+
+    def _cancel_pending(self, task_id: str) -> bool:
+        task = self.task_manager.get_task(task_id)
+        if task is None or task.status != 'pending':
+            return False
+        # Workers skip it when it reaches the head of the queue; None if another worker owns it
+        if self.task_manager.update_task_status(task_id, 'cancelled') is None:
+            return False
+        self.cancelled += 1
+        return True
\ No newline at end of file
@@ -1,50 +1,326 @@
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Iterator, Optional, Set, Tuple
+from collections import OrderedDict
 from datetime import datetime
+import bisect
+import heapq
+import json
+import threading
+import time
 import uuid
 
+TASK_STATUSES = ('pending', 'running', 'succeeded', 'failed', 'cancelled')
+TERMINAL_STATUSES = ('succeeded', 'failed', 'cancelled')
+
+def _isoformat(timestamp: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(timestamp).isoformat() if timestamp is not None else None
+
 class Task:
-    def __init__(self, name: str, description: str, task_type: str):
+    """One orchestrator task; timestamps are epoch seconds"""
+
+    __slots__ = (
+        'id', 'name', 'description', 'type', 'priority', 'status', 'created_at', 'updated_at',
+        'started_at', 'finished_at', 'result', 'error', 'revision', '_dict'
+    )
+
+    def __init__(self, name: str, description: str, task_type: str, priority: int = 0):
         self.id = str(uuid.uuid4())
         self.name = name
         self.description = description
         self.type = task_type
+        self.priority = priority
         self.status = 'pending'
-        self.created_at = datetime.now()
-        self.updated_at = datetime.now()
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Optional[Any] = None
+        self.error: Optional[str] = None
+        # TaskManager revision of this task's latest change
+        self.revision = 0
+        self._dict: Optional[Dict[str, Any]] = None
 
     def to_dict(self) -> Dict[str, Any]:
+        # Built once per change; TaskManager clears it whenever the task is updated
+        if self._dict is None:
+            self._dict = self._build_dict()
+        return self._dict
+
+    def _build_dict(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'name': self.name,
+            'description': self.description,
+            'type': self.type,
+            'priority': self.priority,
+            'status': self.status,
+            'createdAt': _isoformat(self.created_at),
+            'updatedAt': _isoformat(self.updated_at),
+            'startedAt': _isoformat(self.started_at),
+            'finishedAt': _isoformat(self.finished_at),
+            'result': self.result,
+            'error': self.error
+        }
+
+    def to_row(self) -> Dict[str, Any]:
+        """Snapshot in the task store's column layout"""
         return {
             'id': self.id,
             'name': self.name,
             'description': self.description,
             'type': self.type,
+            'priority': self.priority,
             'status': self.status,
-            'createdAt': self.created_at.isoformat(),
-            'updatedAt': self.updated_at.isoformat()
+            'created_at': self.created_at,
+            'updated_at': self.updated_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'result': json.dumps(self.result, default=str) if self.result is not None else None,
+            'error': self.error,
+            'revision': self.revision
         }
 
+    @classmethod
+    def from_row(cls, row: Dict[str, Any]) -> "Task":
+        task = cls.__new__(cls)
+        for field in ('id', 'name', 'description', 'type', 'priority', 'status', 'created_at',
+                      'updated_at', 'started_at', 'finished_at', 'error', 'revision'):
+            setattr(task, field, row[field])
+        task.result = json.loads(row['result']) if row['result'] is not None else None
+        task._dict = None
+        return task
+
 class TaskManager:
-    def __init__(self):
+    """Tasks with secondary indexes for cheap polling and an optional durable store
+
+    Every create or update bumps `revision` and appends the task to a
+    change log ordered by revision, so "what changed after revision N or
+    after time T" is a binary search plus a walk over the changes only.
+    Tasks are also indexed by status and by type.
+
+    With a `store` (see task_store.py) every change is saved to it and
+    the store allocates the revision, so worker processes sharing one
+    store agree on revisions and cursors. Saves are written behind: a
+    change enters the change log, and its event is published, once the
+    store has written it. Only active tasks and the
+    `max_finished` most recently finished ones stay in memory; older
+    finished tasks and other workers' tasks are read back from the store
+    when asked for. Tasks a previous process left pending or running are
+    marked failed on startup rather than run twice.
+
+    With an `events` bus (see event_bus.py) every change is also published
+    as a "task.created" or "task.updated" event carrying the task's dict.
+    """
+
+    def __init__(self, store: Optional[Any] = None, max_finished: int = 1000, events: Optional[Any] = None):
         self.tasks: Dict[str, Task] = {}
+        self.store = store
+        self.events = events
+        self.max_finished = max_finished
+        # Request threads and the task executor's workers update tasks concurrently
+        self._lock = threading.RLock()
+        self.revision = 0
+        self._by_status: Dict[str, Set[str]] = {}
+        self._by_type: Dict[str, Set[str]] = {}
+        # Finished tasks still held in memory, oldest first
+        self._finished: "OrderedDict[str, None]" = OrderedDict()
+        # Parallel lists, ascending; an entry is stale once its task has changed again
+        self._change_revisions: List[int] = []
+        self._change_times: List[float] = []
+        self._change_ids: List[str] = []
+        if store is not None:
+            self._load_active()
+
+    def _load_active(self):
+        self.revision = self.store.max_revision()
+        for row in self.store.load_active(TERMINAL_STATUSES):
+            task = Task.from_row(row)
+            self._add(task)
+            self.update_task_status(task.id, 'failed', error='Interrupted by a restart')
+        # Written before a pre-fork master hands the store to its workers
+        self.store.flush()
 
     def create_task(self, task_details: Dict[str, str]) -> Task:
         task = Task(
             name=task_details['name'],
             description=task_details['description'],
-            task_type=task_details['type']
+            task_type=task_details['type'],
+            priority=int(task_details.get('priority', 0))
         )
-        self.tasks[task.id] = task
+        with self._lock:
+            self._add(task)
+            self._record_change(task, 'task.created')
         return task
 
-    def get_task(self, task_id: str) -> Task:
-        return self.tasks.get(task_id)
+    def get_task(self, task_id: str) -> Optional[Task]:
+        task = self.tasks.get(task_id)
+        if task is None and self.store is not None:
+            row = self.store.load(task_id)
+            if row is not None:
+                task = Task.from_row(row)
+        return task
+
+    def owns(self, task_id: str) -> bool:
+        """Whether this process holds the task in memory and so can run or cancel it"""
+        return task_id in self.tasks
 
     def get_all_tasks(self) -> List[Task]:
-        return list(self.tasks.values())
+        return self.list_tasks()[0]
 
-    def update_task_status(self, task_id: str, status: str) -> Task:
-        task = self.tasks.get(task_id)
-        if task:
-            task.status = status
-            task.updated_at = datetime.now()
-        return task 
\ No newline at end of file
+    def update_task_status(self, task_id: str, status: str, result: Optional[Any] = None,
+                           error: Optional[str] = None) -> Optional[Task]:
+        """Move an active task to `status`, stamping when it started or finished; None if not held here"""
+        with self._lock:
+            task = self.tasks.get(task_id)
+            if task:
+                now = time.time()
+                if task.status != status:
+                    self._by_status[task.status].discard(task.id)
+                    self._by_status.setdefault(status, set()).add(task.id)
+                task.status = status
+                task.updated_at = now
+                if status == 'running':
+                    task.started_at = now
+                elif status in TERMINAL_STATUSES:
+                    task.finished_at = now
+                if result is not None:
+                    task.result = result
+                if error is not None:
+                    task.error = error
+                self._record_change(task)
+                if status in TERMINAL_STATUSES:
+                    self._retire(task)
+            return task
+
+    def list_tasks(self, status: Optional[str] = None, task_type: Optional[str] = None,
+                   since: Optional[datetime] = None, cursor: int = 0,
+                   limit: Optional[int] = None) -> Tuple[List[Task], Optional[int]]:
+        """Tasks changed after revision `cursor` and after `since`, oldest change first
+
+        Returns the page and the cursor for the next page, or None when
+        nothing further matches. Passing the `revision` seen on the last
+        poll as `cursor` returns only what changed since.
+        """
+        if limit is not None and limit < 1:
+            raise ValueError("limit must be at least 1")
+        with self._lock:
+            start = bisect.bisect_right(self._change_revisions, cursor)
+            if since is not None:
+                start = max(start, bisect.bisect_right(self._change_times, since.timestamp()))
+            changed = self._changed_tasks(status, task_type, start)
+            if self.store is not None:
+                changed = heapq.merge(
+                    changed,
+                    self._archived_changes(status, task_type, since, cursor),
+                    key=lambda task: task.revision
+                )
+            page: List[Task] = []
+            for task in changed:
+                if limit is not None and len(page) >= limit:
+                    return page, page[-1].revision
+                page.append(task)
+            return page, None
+
+    def committed_changes(self, after_revision: int, task_type: Optional[str] = None) -> Iterator[Task]:
+        """Tasks committed to the store after `after_revision` by any process, in revision order"""
+        for row in self.store.iter_changes(after_revision, task_type=task_type):
+            yield Task.from_row(row)
+
+    def latest_revision(self) -> int:
+        """Revision of the latest change, including other processes' changes to a shared store"""
+        if self.store is not None:
+            return self.store.max_revision()
+        return self.revision
+
+    def close(self):
+        """Close the store"""
+        if self.store is not None:
+            self.store.close()
+
+    def _add(self, task: Task):
+        self.tasks[task.id] = task
+        self._by_status.setdefault(task.status, set()).add(task.id)
+        self._by_type.setdefault(task.type, set()).add(task.id)
+        if task.status in TERMINAL_STATUSES:
+            self._retire(task)
+
+    def _retire(self, task: Task):
+        """Track a finished task and archive the oldest ones beyond `max_finished`"""
+        if self.store is None:
+            return
+        self._finished[task.id] = None
+        while len(self._finished) > self.max_finished:
+            task_id, _ = self._finished.popitem(last=False)
+            archived = self.tasks.pop(task_id)
+            self._by_status[archived.status].discard(task_id)
+            self._by_type[archived.type].discard(task_id)
+
+    def _archived_changes(self, status: Optional[str], task_type: Optional[str], since: Optional[datetime],
+                          cursor: int) -> Iterator[Task]:
+        """Matching tasks only the store holds, in revision order"""
+        rows = self.store.iter_changes(cursor, since.timestamp() if since is not None else None, status, task_type)
+        for row in rows:
+            if row['id'] not in self.tasks:
+                yield Task.from_row(row)
+
+    def _changed_tasks(self, status: Optional[str], task_type: Optional[str], start: int) -> Iterator[Task]:
+        """Matching in-memory tasks whose latest change is at or after change log position `start`"""
+        matching: Optional[Set[str]] = None
+        if status is not None:
+            matching = self._by_status.get(status, set())
+        if task_type is not None:
+            by_type = self._by_type.get(task_type, set())
+            matching = by_type if matching is None else matching & by_type
+
+        if matching is not None and len(matching) < len(self._change_ids) - start:
+            # The filter is more selective than the change window: walk the index instead
+            floor = self._change_revisions[start - 1] if start else 0
+            tasks = sorted((self.tasks[task_id] for task_id in matching), key=lambda task: task.revision)
+            yield from (task for task in tasks if task.revision > floor)
+            return
+
+        for position in range(start, len(self._change_ids)):
+            task = self.tasks.get(self._change_ids[position])
+            if task is None or task.revision != self._change_revisions[position]:
+                continue
+            if status is not None and task.status != status:
+                continue
+            if task_type is not None and task.type != task_type:
+                continue
+            yield task
+
+    def _record_change(self, task: Task, event: str = 'task.updated'):
+        task._dict = None
+        # Snapshots of this change; the task may change again before the store has written it
+        snapshot, changed = task.to_dict(), task.updated_at
+        if self.store is not None:
+            # Written behind on the store's thread, which allocates revisions shared by every worker process
+            self.store.save(task.to_row(), lambda revision: self._apply_revision(task, revision, event, snapshot, changed))
+        else:
+            self._apply_revision(task, self.revision + 1, event, snapshot, changed)
+
+    def _apply_revision(self, task: Task, revision: int, event: str, snapshot: Dict[str, Any], changed: float):
+        """Log a change once it has its revision; changes arrive in revision order"""
+        with self._lock:
+            task.revision = revision
+            self.revision = max(self.revision, revision)
+            if self.events is not None and self.events.has_subscribers:
+                self.events.publish({'type': event, 'revision': revision, 'task': snapshot})
+            # Kept non-decreasing so `since` lookups can bisect even if the clock steps back
+            if self._change_times:
+                changed = max(changed, self._change_times[-1])
+            self._change_revisions.append(revision)
+            self._change_times.append(changed)
+            self._change_ids.append(task.id)
+            if len(self._change_ids) > 2 * len(self.tasks) + 1024:
+                self._compact_changes()
+
+    def _compact_changes(self):
+        """Drop change log entries superseded by a later change or an archived task"""
+        live = [
+            (revision, changed, task_id)
+            for revision, changed, task_id in zip(self._change_revisions, self._change_times, self._change_ids)
+            if task_id in self.tasks and self.tasks[task_id].revision == revision
+        ]
+        self._change_revisions = [entry[0] for entry in live]
+        self._change_times = [entry[1] for entry in live]
+        self._change_ids = [entry[2] for entry in live]
\ No newline at end of file
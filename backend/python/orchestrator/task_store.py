@@ -0,0 +1,231 @@
+from typing import Dict, Any, Callable, Iterator, List, Optional
+from abc import ABC, abstractmethod
+from pathlib import Path
+import os
+import queue
+import sqlite3
+import threading
+import time
+from llm.sqlite_connection import ForkSafeConnection
+
+TASK_FIELDS = (
+    "id", "name", "description", "type", "priority", "status", "created_at", "updated_at",
+    "started_at", "finished_at", "result", "error", "revision"
+)
+
+class TaskStore(ABC):
+    """Persistence backend for TaskManager
+
+    Rows are Task.to_row() dicts. TaskManager saves every change, keeps
+    active and recently finished tasks in memory and reads older ones
+    back through load() and iter_changes().
+
+    The store allocates revisions. Every process sharing it sees one
+    ascending sequence, so a revision from one worker is a valid
+    cursor in another.
+    """
+
+    @abstractmethod
+    def save(self, row: Dict[str, Any], on_saved: Callable[[int], None]):
+        """Queue `row` as the task's latest change; `on_saved(revision)` runs once it is written
+
+        Saves are written in the order they were queued and their
+        callbacks run in that order, on one thread, so revisions reach
+        TaskManager ascending.
+        """
+
+    def flush(self):
+        """Block until every save queued so far is written"""
+
+    @abstractmethod
+    def load(self, task_id: str) -> Optional[Dict[str, Any]]:
+        pass
+
+    @abstractmethod
+    def load_active(self, terminal_statuses: tuple) -> List[Dict[str, Any]]:
+        """Every task whose status is not terminal"""
+
+    @abstractmethod
+    def iter_changes(self, after_revision: int = 0, since: Optional[float] = None, status: Optional[str] = None,
+                     task_type: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Tasks whose last change is after `after_revision` and `since`, in revision order"""
+
+    @abstractmethod
+    def max_revision(self) -> int:
+        """The latest revision any process sharing the store has allocated"""
+
+    def close(self):
+        pass
+
+class SQLiteTaskStore(TaskStore):
+    """Tasks in an embedded SQLite database, one row per task
+
+    Saves are written behind by a writer thread with its own connection,
+    so callers, including the event loop, never wait on SQLite's write
+    lock. The writer commits whatever has queued up as one transaction:
+    it takes the write lock, allocates the range MAX(revision) + 1 .. + n
+    and writes the rows. Workers sharing the file therefore never reuse
+    a revision, and rows commit in revision order.
+    """
+
+    def __init__(self, path: Path, page_size: int = 500):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.page_size = page_size
+        self._lock = threading.Lock()
+        self._connection = ForkSafeConnection(self._connect)
+        self._writer_lock = threading.Lock()
+        self._writer: Optional[threading.Thread] = None
+        self._writer_pid: Optional[int] = None
+        self._pending: "queue.Queue" = queue.Queue()
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                id TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                description TEXT NOT NULL,
+                type TEXT NOT NULL,
+                priority INTEGER NOT NULL DEFAULT 0,
+                status TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                result TEXT,
+                error TEXT,
+                revision INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS tasks_revision ON tasks (revision);
+            CREATE INDEX IF NOT EXISTS tasks_status_revision ON tasks (status, revision);
+            CREATE INDEX IF NOT EXISTS tasks_type_revision ON tasks (type, revision);
+        """)
+        self._conn.commit()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        return conn
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        return self._connection.get()
+
+    def save(self, row: Dict[str, Any], on_saved: Callable[[int], None]):
+        self._start_writer().put((row, on_saved))
+
+    def flush(self):
+        with self._writer_lock:
+            if self._writer is None or self._writer_pid != os.getpid():
+                return
+        done = threading.Event()
+        self._pending.put((None, lambda _: done.set()))
+        done.wait()
+
+    def load(self, task_id: str) -> Optional[Dict[str, Any]]:
+        rows = self._select("WHERE id = ?", (task_id,))
+        return rows[0] if rows else None
+
+    def load_active(self, terminal_statuses: tuple) -> List[Dict[str, Any]]:
+        placeholders = ", ".join("?" for _ in terminal_statuses)
+        return self._select(f"WHERE status NOT IN ({placeholders}) ORDER BY revision", tuple(terminal_statuses))
+
+    def iter_changes(self, after_revision: int = 0, since: Optional[float] = None, status: Optional[str] = None,
+                     task_type: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        conditions, params = ["revision > ?"], []
+        if since is not None:
+            conditions.append("updated_at > ?")
+            params.append(since)
+        if status is not None:
+            conditions.append("status = ?")
+            params.append(status)
+        if task_type is not None:
+            conditions.append("type = ?")
+            params.append(task_type)
+        where = "WHERE " + " AND ".join(conditions) + " ORDER BY revision LIMIT ?"
+
+        # Read a page at a time so a caller that stops early never loads the whole table
+        while True:
+            rows = self._select(where, (after_revision, *params, self.page_size))
+            yield from rows
+            if len(rows) < self.page_size:
+                return
+            after_revision = rows[-1]["revision"]
+
+    def max_revision(self) -> int:
+        with self._lock:
+            row = self._conn.execute("SELECT MAX(revision) FROM tasks").fetchone()
+        return row[0] or 0
+
+    def close(self):
+        with self._writer_lock:
+            writer = self._writer if self._writer_pid == os.getpid() else None
+            self._writer = None
+        if writer is not None:
+            # Written before the writer stops
+            self._pending.put(None)
+            writer.join()
+        with self._lock:
+            self._conn.close()
+
+    def _start_writer(self) -> "queue.Queue":
+        with self._writer_lock:
+            # Threads do not survive fork(): a pre-forked worker starts its own
+            if self._writer is None or self._writer_pid != os.getpid():
+                self._writer_pid = os.getpid()
+                self._pending = queue.Queue()
+                self._writer = threading.Thread(
+                    target=self._write_loop, args=(self._pending,), name="task-store-writer", daemon=True
+                )
+                self._writer.start()
+            return self._pending
+
+    def _write_loop(self, pending: "queue.Queue"):
+        conn = self._connect()
+        while True:
+            batch = [pending.get()]
+            while True:
+                try:
+                    batch.append(pending.get_nowait())
+                except queue.Empty:
+                    break
+            stopping = None in batch
+            batch = [item for item in batch if item is not None]
+
+            revisions = iter(self._commit(conn, [row for row, _ in batch if row is not None]))
+            for row, on_saved in batch:
+                try:
+                    on_saved(next(revisions) if row is not None else None)
+                except Exception as e:
+                    print(f"Failed to apply saved task change: {str(e)}")
+            if stopping:
+                conn.close()
+                return
+
+    def _commit(self, conn: sqlite3.Connection, rows: List[Dict[str, Any]]) -> List[int]:
+        """Write `rows` in one transaction, returning the contiguous revisions allocated to them"""
+        if not rows:
+            return []
+        while True:
+            try:
+                with conn:
+                    # IMMEDIATE takes the write lock before MAX is read, so no other process can allocate in between
+                    conn.execute("BEGIN IMMEDIATE")
+                    first = conn.execute("SELECT COALESCE(MAX(revision), 0) + 1 FROM tasks").fetchone()[0]
+                    conn.executemany(
+                        f"INSERT OR REPLACE INTO tasks ({', '.join(TASK_FIELDS)}) "
+                        f"VALUES ({', '.join('?' for _ in TASK_FIELDS)})",
+                        [
+                            tuple(first + offset if field == "revision" else row[field] for field in TASK_FIELDS)
+                            for offset, row in enumerate(rows)
+                        ]
+                    )
+                return list(range(first, first + len(rows)))
+            except sqlite3.Error as e:
+                # Typically another worker holding the write lock past the busy timeout; keep the order and retry
+                print(f"Failed to save tasks: {str(e)}")
+                time.sleep(1)
+
+    def _select(self, clause: str, params: tuple) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(f"SELECT {', '.join(TASK_FIELDS)} FROM tasks {clause}", params).fetchall()
+        return [dict(zip(TASK_FIELDS, row)) for row in rows]
\ No newline at end of file